@@ -4,14 +4,20 @@ Refines and corrects RAG responses through iterative improvement
 """
 
 import asyncio
+import io
 import json
+import hashlib
+import heapq
+import time
+from collections import OrderedDict, deque
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import numpy as np
 import logging
 
-from app.services.llm_service import LLMService
+from app.services.llm_service import LLMService, is_cacheable_response
+from app.services.llm_cache import SemanticLLMCache
 #from app.agents.rag_agent import RAGAgent, RAGResponse
 from app.models.incident import Incident
 from app.utils.validation import ResponseValidator
@@ -19,15 +25,58 @@ from app.utils.validation import ResponseValidator
 from app.agents.rag_agent import LangChainRAGAgent as RAGAgent
 
 # Define RAGResponse here if not in rag_agent
+@dataclass(slots=True)
 class RAGResponse:
-    def __init__(self, recommendations=None, confidence=0.5, sources=None):
-        self.recommendations = recommendations or []
-        self.confidence = confidence
-        self.sources = sources or []
+    recommendations: List[Dict[str, Any]] = field(default_factory=list)
+    confidence: float = 0.5
+    sources: List[Dict[str, Any]] = field(default_factory=list)
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    
+    def __post_init__(self):
+        self.recommendations = self.recommendations or []
+        self.sources = self.sources or []
 
 logger = logging.getLogger(__name__)
 
-@dataclass
+# orjson is several times faster than stdlib json for the multi-KB payloads
+# parsed and serialized every iteration; fall back to json when unavailable
+try:
+    import orjson
+    
+    _json_loads = orjson.loads
+    
+    def _json_dumps_indented(obj: Any) -> str:
+        return orjson.dumps(
+            obj,
+            option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        ).decode()
+    
+    def _cache_key(payload: Dict[str, Any]) -> str:
+        return hashlib.sha256(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)).hexdigest()
+except ImportError:
+    _json_loads = json.loads
+    
+    def _json_dumps_indented(obj: Any) -> str:
+        return json.dumps(obj, indent=2)
+    
+    def _cache_key(payload: Dict[str, Any]) -> str:
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+_prompt_json_encoder = json.JSONEncoder(indent=2)
+
+def _bounded_json_dumps(obj: Any, max_chars: int = 500) -> str:
+    """
+    Same as json.dumps(obj, indent=2)[:max_chars], but stops encoding once
+    max_chars have been produced instead of serializing the whole object
+    """
+    buf = io.StringIO()
+    for chunk in _prompt_json_encoder.iterencode(obj):
+        buf.write(chunk)
+        if buf.tell() >= max_chars:
+            break
+    return buf.getvalue()[:max_chars]
+
+@dataclass(slots=True)
 class CAGIteration:
     """Single iteration of CAG refinement"""
     iteration_number: int
@@ -39,7 +88,7 @@ class CAGIteration:
     issues_found: List[str]
     improvements: List[str]
 
-@dataclass
+@dataclass(slots=True)
 class CAGResponse:
     """Complete CAG refinement response"""
     final_recommendations: List[Dict[str, Any]]
@@ -60,13 +109,122 @@ class CAGAgent:
     - Iterative refinement
     """
     
+    # Issue source priorities for the top-10 selection in _identify_issues
+    _CRITIQUE_PRIORITY = 3
+    _FACT_CHECK_PRIORITY = 2
+    _VALIDATION_PRIORITY = 1
+    
+    _REVIEW_TEMPLATE = """
+        Review the following incident response. Identify weaknesses and check its technical accuracy.
+        
+        Incident:
+        Title: {title}
+        Description: {description}
+        Priority: {priority}
+        
+        Current Response:
+        {response_json}
+        
+        For "issues", check for:
+        1. Completeness - Are all aspects of the incident addressed?
+        2. Accuracy - Are the technical details correct?
+        3. Clarity - Are the instructions clear and actionable?
+        4. Relevance - Does the solution match the problem?
+        5. Feasibility - Can the solution be implemented with available resources?
+        6. Risk - Are there any potential risks not addressed?
+        
+        For "fact_errors", list any factual errors or misleading information.
+        
+        Respond with JSON only:
+        {{
+            "issues": ["issue 1", "issue 2"],
+            "fact_errors": ["error 1"]
+        }}
+        """
+    
+    _CRITIQUE_TEMPLATE = """
+        Analyze the following incident response and identify any issues, weaknesses, or areas for improvement.
+        
+        Incident:
+        Title: {title}
+        Description: {description}
+        Priority: {priority}
+        
+        Current Response:
+        {response_json}
+        
+        Check for:
+        1. Completeness - Are all aspects of the incident addressed?
+        2. Accuracy - Are the technical details correct?
+        3. Clarity - Are the instructions clear and actionable?
+        4. Relevance - Does the solution match the problem?
+        5. Feasibility - Can the solution be implemented with available resources?
+        6. Risk - Are there any potential risks not addressed?
+        
+        List specific issues found (one per line):
+        """
+    
+    _CORRECTION_TEMPLATE = """
+        Generate specific corrections for the following issues in the incident response.
+        
+        Incident Context:
+        {title}: {description}
+        
+        Current Response Summary:
+        {response_summary}
+        
+        Issues to Address:
+        {issues}
+        
+        For each issue, provide a specific correction in JSON format:
+        {{
+            "issue_number": <number>,
+            "correction_type": "addition|modification|removal|clarification",
+            "target_field": "field_to_modify",
+            "correction_content": "specific correction text or data",
+            "rationale": "why this correction improves the response"
+        }}
+        
+        Provide corrections as a JSON array:
+        """
+    
+    _CONSISTENCY_TEMPLATE = """
+        Review this incident response for internal consistency.
+        Fix any contradictions or inconsistencies.
+        
+        Incident: {title}
+        
+        Response to review:
+        {response_json}
+        
+        Return the response with any consistency issues fixed.
+        Maintain the same JSON structure.
+        """
+    
+    _FACT_CHECK_TEMPLATE = """
+        Check the technical accuracy of this response.
+        Identify any factual errors or misleading information.
+        
+        Response: {response_summary}
+        
+        List any factual errors (one per line):
+        """
+    
+    _QUALITY_TEMPLATE = """
+        Rate the quality of this incident response on a scale of 0-100.
+        Consider completeness, accuracy, clarity, and actionability.
+        
+        Response: {response_summary}
+        
+        Return only the numeric score:
+        """
+    
     def __init__(
         self,
         llm_service: LLMService,
         rag_agent: Optional[RAGAgent] = None,
         config: Optional[Dict] = None
     ):
-        self.llm_service = llm_service
         self.rag_agent = rag_agent
         self.validator = ResponseValidator()
         
@@ -79,10 +237,41 @@ class CAGAgent:
         self.enable_fact_checking = self.config.get('enable_fact_checking', True)
         self.enable_consistency_check = self.config.get('enable_consistency_check', True)
         
-        # Learning components
-        self.correction_history = []
-        self.success_patterns = []
-        self.failure_patterns = []
+        # The critique/fact-check/consistency/quality templates are re-issued with
+        # near-identical incident text, so they can be answered from a semantic cache
+        if self.config.get('enable_semantic_cache', False):
+            llm_service = SemanticLLMCache(
+                llm_service,
+                threshold=self.config.get('semantic_cache_threshold', 0.87),
+                ttl=self.config.get('semantic_cache_ttl', 3600),
+                max_size=self.config.get('semantic_cache_size', 10000)
+            )
+        self.llm_service = llm_service
+        
+        # Exact-match cache for low-temperature calls, which are effectively
+        # deterministic and get re-issued verbatim across retries
+        self.deterministic_temperature = self.config.get('deterministic_temperature', 0.2)
+        self.deterministic_cache_size = self.config.get('deterministic_cache_size', 5000)
+        self._deterministic_cache: "OrderedDict[str, str]" = OrderedDict()
+        
+        # Learning components - per-refinement numbers are stored column-wise
+        # in a fixed-size ring buffer so stats are reductions over contiguous arrays
+        self.max_history = self.config.get('max_history', 1000)
+        self._history_iterations = np.zeros(self.max_history, dtype=np.int32)
+        self._history_improvement = np.zeros(self.max_history, dtype=np.float64)
+        self._history_confidence = np.zeros(self.max_history, dtype=np.float64)
+        self._history_incident_types = [None] * self.max_history
+        self._history_timestamps = np.zeros(self.max_history, dtype=np.int64)  # epoch ns
+        self._history_next = 0
+        self._history_len = 0
+        max_patterns = self.config.get('max_patterns', 500)
+        self.success_patterns = deque(maxlen=max_patterns)
+        self.failure_patterns = deque(maxlen=max_patterns)
+        
+        # Reusable scratch lists for per-iteration intermediates that never
+        # leave the agent (anything attached to a CAGIteration can't be pooled)
+        self._scratch_list_pool: List[list] = []
+        self._scratch_pool_size = 16
         
         logger.info("CAG Agent initialized with configuration: %s", self.config)
     
@@ -95,7 +284,29 @@ class CAGAgent:
         """
         Main refinement method - iteratively improves RAG response
         """
-        start_time = datetime.now()
+        start_time = time.perf_counter()
+        
+        # Nothing to refine - skip the response conversion and loop setup
+        if rag_response.confidence >= self.confidence_target:
+            logger.info(f"Target confidence {self.confidence_target} already met, skipping refinement")
+            response = CAGResponse(
+                final_recommendations=rag_response.recommendations,
+                final_confidence=rag_response.confidence,
+                iterations=[],
+                total_iterations=0,
+                improvement_percentage=0.0,
+                sources=rag_response.sources,
+                metadata={
+                    "initial_confidence": rag_response.confidence,
+                    "processing_time": time.perf_counter() - start_time,
+                    "converged": True,
+                    "short_circuit": True,
+                    "cag_config": self.config
+                }
+            )
+            await self._update_learning(incident, response)
+            return response
+        
         iterations = []
         current_response = self._convert_rag_to_dict(rag_response)
         current_confidence = rag_response.confidence
@@ -143,7 +354,7 @@ class CAGAgent:
             sources=rag_response.sources,
             metadata={
                 "initial_confidence": initial_confidence,
-                "processing_time": (datetime.now() - start_time).total_seconds(),
+                "processing_time": time.perf_counter() - start_time,
                 "converged": current_confidence >= self.confidence_target,
                 "cag_config": self.config
             }
@@ -166,25 +377,52 @@ class CAGAgent:
         Perform one iteration of refinement
         """
         # Step 1: Identify issues in current response
-        issues = await self._identify_issues(incident, current_response)
+        issues, validator_fixes = await self._identify_issues(incident, current_response)
+        
+        # Nothing to correct - skip the correction, consistency and quality
+        # calls; the unchanged confidence ends the loop as converged
+        if not issues:
+            return CAGIteration(
+                iteration_number=iteration_number,
+                input_response=current_response,
+                corrections=[],
+                refined_response=current_response,
+                confidence_before=current_confidence,
+                confidence_after=current_confidence,
+                issues_found=[],
+                improvements=[]
+            )
         
         # Step 2: Generate corrections for identified issues
-        corrections = await self._generate_corrections(incident, current_response, issues)
+        corrections = await self._generate_corrections(
+            incident, current_response, issues, validator_fixes
+        )
         
         # Step 3: Apply corrections to create refined response
         refined_response = await self._apply_corrections(current_response, corrections)
         
-        # Step 4: Validate refined response
-        if self.enable_consistency_check:
-            refined_response = await self._ensure_consistency(incident, refined_response)
-        
-        # Step 5: Calculate new confidence
-        new_confidence = await self._calculate_refined_confidence(
-            incident, refined_response, issues, corrections
-        )
+        # Step 4 + 5: Validate refined response and calculate new confidence.
+        # The quality rating only needs the corrected response, so it runs
+        # concurrently with the consistency pass instead of after it. The task
+        # group cancels the other call if one fails rather than leaving it running.
+        consistency_task = None
+        async with asyncio.TaskGroup() as tg:
+            confidence_task = tg.create_task(self._calculate_refined_confidence(
+                incident, refined_response, issues, corrections
+            ))
+            if self.enable_consistency_check:
+                consistency_task = tg.create_task(
+                    self._ensure_consistency(incident, refined_response)
+                )
+        
+        new_confidence = confidence_task.result()
+        if consistency_task is not None:
+            refined_response = consistency_task.result()
         
         # Step 6: Identify improvements made
-        improvements = self._identify_improvements(current_response, refined_response)
+        improvements = self._identify_improvements(
+            current_response, refined_response, corrections
+        )
         
         return CAGIteration(
             iteration_number=iteration_number,
@@ -197,69 +435,200 @@ class CAGAgent:
             improvements=improvements
         )
     
+    async def _cached_generate(
+        self,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        response_format: Optional[str] = None
+    ) -> str:
+        """
+        Generate text, reusing the previous completion for identical
+        low-temperature requests
+        """
+        kwargs = {"response_format": response_format} if response_format else {}
+        
+        if temperature > self.deterministic_temperature:
+            return await self.llm_service.generate(
+                prompt=prompt,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                **kwargs
+            )
+        
+        key = _cache_key(
+            {"p": prompt, "t": temperature, "m": max_tokens, "f": response_format}
+        )
+        
+        cached = self._deterministic_cache.get(key)
+        if cached is not None:
+            self._deterministic_cache.move_to_end(key)
+            return cached
+        
+        result = await self.llm_service.generate(
+            prompt=prompt,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            **kwargs
+        )
+        
+        # generate() answers failures with fallback text; caching that would
+        # keep serving it after the LLM recovers
+        if is_cacheable_response(result):
+            self._deterministic_cache[key] = result
+            if len(self._deterministic_cache) > self.deterministic_cache_size:
+                self._deterministic_cache.popitem(last=False)
+        
+        return result
+    
     async def _identify_issues(
         self,
         incident: Incident,
         response: Dict[str, Any]
-    ) -> List[str]:
+    ) -> Tuple[List[str], Dict[str, Dict[str, Any]]]:
         """
-        Identify issues in the current response using self-reflection
+        Identify issues in the current response using self-reflection.
+        Also returns the validator issues that can be corrected without the
+        LLM, mapped to their correction.
         """
-        issues = []
+        # Serialized once and shared by the review prompt and its fallback
+        response_json = _json_dumps_indented(response)
+        
+        # Critique and fact check fused into one round trip when fact checking
+        # is on. The validation checks run in a worker thread meanwhile, so
+        # they overlap the LLM call instead of following it.
+        review_task = None
+        async with asyncio.TaskGroup() as tg:
+            if self.enable_fact_checking:
+                review_task = tg.create_task(
+                    self._combined_review(incident, response_json)
+                )
+            validation_task = tg.create_task(asyncio.to_thread(
+                self.validator.validate_response_with_fixes, response
+            ))
         
-        # Use LLM for self-critique
-        critique_prompt = f"""
-        Analyze the following incident response and identify any issues, weaknesses, or areas for improvement.
+        # Additional validation checks
+        validation_results = validation_task.result()
+        validation_issues = [result["issue"] for result in validation_results]
+        validator_fixes = {
+            result["issue"]: {
+                "correction_type": "modification",
+                "target_field": result["target_field"],
+                "correction_content": result["suggested_fix"],
+                "rationale": "Structural repair from response validation"
+            }
+            for result in validation_results
+            if result["suggested_fix"] is not None
+        }
         
-        Incident:
-        Title: {incident.title}
-        Description: {incident.description}
-        Priority: {incident.priority}
+        review = review_task.result() if review_task is not None else None
+        if review is not None:
+            critique_issues, fact_issues = review
+        elif self.enable_fact_checking:
+            # Combined reply was unparseable - fall back to the separate
+            # prompts, which are independent and run concurrently
+            async with asyncio.TaskGroup() as tg:
+                critique_task = tg.create_task(self._critique(incident, response_json))
+                fact_task = tg.create_task(self._check_facts(incident, response))
+            critique_issues, fact_issues = critique_task.result(), fact_task.result()
+        else:
+            critique_issues, fact_issues = await self._critique(incident, response_json), []
         
-        Current Response:
-        {json.dumps(response, indent=2)}
+        # Tag each issue with its source priority. Only the top 10 are
+        # returned, so the full tagged list is scratch.
+        issues = self._acquire_scratch_list()
+        issues.extend((self._CRITIQUE_PRIORITY, issue) for issue in critique_issues)
+        issues.extend((self._FACT_CHECK_PRIORITY, issue) for issue in fact_issues)
+        issues.extend((self._VALIDATION_PRIORITY, issue) for issue in validation_issues)
         
-        Check for:
-        1. Completeness - Are all aspects of the incident addressed?
-        2. Accuracy - Are the technical details correct?
-        3. Clarity - Are the instructions clear and actionable?
-        4. Relevance - Does the solution match the problem?
-        5. Feasibility - Can the solution be implemented with available resources?
-        6. Risk - Are there any potential risks not addressed?
+        logger.info(f"Identified {len(issues)} issues in current response")
+        # Limit to top 10 issues to prevent over-correction; nlargest is
+        # stable, so issues keep their order within a source
+        top_issues = [issue for _, issue in heapq.nlargest(10, issues, key=lambda tagged: tagged[0])]
+        self._release_scratch_list(issues)
+        return top_issues, validator_fixes
+    
+    def _acquire_scratch_list(self) -> list:
+        """Take an empty list from the scratch pool"""
+        return self._scratch_list_pool.pop() if self._scratch_list_pool else []
+    
+    def _release_scratch_list(self, scratch: list):
+        """Clear a scratch list and return it to the pool"""
+        scratch.clear()
+        if len(self._scratch_list_pool) < self._scratch_pool_size:
+            self._scratch_list_pool.append(scratch)
+    
+    async def _combined_review(
+        self,
+        incident: Incident,
+        response_json: str
+    ) -> Optional[Tuple[List[str], List[str]]]:
+        """
+        Critique and fact-check the response in a single LLM call.
+        Returns (issues, fact_issues), or None if the reply isn't valid JSON.
+        """
+        review_prompt = self._REVIEW_TEMPLATE.format_map({
+            "title": incident.title,
+            "description": incident.description,
+            "priority": incident.priority,
+            "response_json": response_json
+        })
         
-        List specific issues found (one per line):
+        review_response = await self._cached_generate(
+            prompt=review_prompt,
+            max_tokens=800,
+            temperature=0.2,
+            response_format="json"
+        )
+        
+        try:
+            review = _json_loads(review_response)
+            issues = [str(i).strip() for i in review.get('issues', []) if str(i).strip()]
+            fact_issues = [
+                f"Factual error: {str(e).strip()}"
+                for e in review.get('fact_errors', [])
+                if str(e).strip()
+            ]
+        except (json.JSONDecodeError, AttributeError, TypeError):
+            logger.warning("Failed to parse combined review, falling back to separate prompts")
+            return None
+        
+        return issues, fact_issues
+    
+    async def _critique(
+        self,
+        incident: Incident,
+        response_json: str
+    ) -> List[str]:
+        """
+        Self-critique the response, one issue per line
         """
+        critique_prompt = self._CRITIQUE_TEMPLATE.format_map({
+            "title": incident.title,
+            "description": incident.description,
+            "priority": incident.priority,
+            "response_json": response_json
+        })
         
-        critique_response = await self.llm_service.generate(
+        critique_response = await self._cached_generate(
             prompt=critique_prompt,
             max_tokens=500,
             temperature=0.3
         )
         
         # Parse issues from response
-        issues.extend([
+        return [
             issue.strip() 
             for issue in critique_response.split('\n') 
             if issue.strip() and not issue.startswith('#')
-        ])
-        
-        # Additional validation checks
-        validation_issues = self.validator.validate_response(response)
-        issues.extend(validation_issues)
-        
-        # Fact checking if enabled
-        if self.enable_fact_checking:
-            fact_issues = await self._check_facts(incident, response)
-            issues.extend(fact_issues)
-        
-        logger.info(f"Identified {len(issues)} issues in current response")
-        return issues[:10]  # Limit to top 10 issues to prevent over-correction
+        ]
     
     async def _generate_corrections(
         self,
         incident: Incident,
         response: Dict[str, Any],
-        issues: List[str]
+        issues: List[str],
+        validator_fixes: Optional[Dict[str, Dict[str, Any]]] = None
     ) -> List[Dict[str, Any]]:
         """
         Generate specific corrections for identified issues
@@ -269,32 +638,32 @@ class CAGAgent:
         if not issues:
             return corrections
         
-        # Generate corrections for each issue
-        correction_prompt = f"""
-        Generate specific corrections for the following issues in the incident response.
-        
-        Incident Context:
-        {incident.title}: {incident.description}
-        
-        Current Response Summary:
-        {json.dumps(response.get('recommendations', [{}])[0], indent=2)[:500]}
-        
-        Issues to Address:
-        {chr(10).join(f"{i+1}. {issue}" for i, issue in enumerate(issues))}
-        
-        For each issue, provide a specific correction in JSON format:
-        {{
-            "issue_number": <number>,
-            "correction_type": "addition|modification|removal|clarification",
-            "target_field": "field_to_modify",
-            "correction_content": "specific correction text or data",
-            "rationale": "why this correction improves the response"
-        }}
-        
-        Provide corrections as a JSON array:
-        """
+        # Validator issues with a structural repair are corrected directly.
+        # Fixes for the same field carry the same repaired value, so one is enough.
+        validator_fixes = validator_fixes or {}
+        deterministic_corrections = []
+        fixed_fields = set()
+        for issue in issues:
+            fix = validator_fixes.get(issue)
+            if fix is not None and fix["target_field"] not in fixed_fields:
+                fixed_fields.add(fix["target_field"])
+                deterministic_corrections.append(fix)
+        
+        # Only the remaining issues need the LLM
+        issues = [issue for issue in issues if issue not in validator_fixes]
+        if not issues:
+            logger.info(f"Generated {len(deterministic_corrections)} corrections without LLM")
+            return deterministic_corrections
         
-        correction_response = await self.llm_service.generate(
+        # Generate corrections for each issue
+        correction_prompt = self._CORRECTION_TEMPLATE.format_map({
+            "title": incident.title,
+            "description": incident.description,
+            "response_summary": _bounded_json_dumps(response.get('recommendations', [{}])[0]),
+            "issues": "\n".join(f"{i+1}. {issue}" for i, issue in enumerate(issues))
+        })
+        
+        correction_response = await self._cached_generate(
             prompt=correction_prompt,
             max_tokens=800,
             temperature=0.2
@@ -302,7 +671,7 @@ class CAGAgent:
         
         try:
             # Parse JSON response
-            corrections = json.loads(correction_response)
+            corrections = _json_loads(correction_response)
             if not isinstance(corrections, list):
                 corrections = [corrections]
                 
@@ -317,6 +686,9 @@ class CAGAgent:
                     "rationale": "Improve response quality"
                 })
         
+        # Structural repairs go first so LLM corrections to the same field win
+        corrections = deterministic_corrections + corrections
+        
         logger.info(f"Generated {len(corrections)} corrections")
         return corrections
     
@@ -328,7 +700,11 @@ class CAGAgent:
         """
         Apply corrections to create refined response
         """
-        refined = json.loads(json.dumps(response))  # Deep copy
+        # Shallow copy: corrections only rebind top-level fields, so nested
+        # values are shared with the input and a list is copied only right
+        # before it is appended to
+        refined = dict(response)
+        copied_fields = set()
         
         for correction in corrections:
             try:
@@ -340,6 +716,9 @@ class CAGAgent:
                     # Add new content
                     if target in refined:
                         if isinstance(refined[target], list):
+                            if target not in copied_fields:
+                                refined[target] = list(refined[target])
+                                copied_fields.add(target)
                             refined[target].append(content)
                         else:
                             refined[target] = f"{refined[target]} {content}"
@@ -378,27 +757,19 @@ class CAGAgent:
         """
         Ensure internal consistency of the response
         """
-        consistency_prompt = f"""
-        Review this incident response for internal consistency.
-        Fix any contradictions or inconsistencies.
-        
-        Incident: {incident.title}
-        
-        Response to review:
-        {json.dumps(response, indent=2)}
-        
-        Return the response with any consistency issues fixed.
-        Maintain the same JSON structure.
-        """
+        consistency_prompt = self._CONSISTENCY_TEMPLATE.format_map({
+            "title": incident.title,
+            "response_json": _json_dumps_indented(response)
+        })
         
-        consistent_response = await self.llm_service.generate(
+        consistent_response = await self._cached_generate(
             prompt=consistency_prompt,
             max_tokens=1000,
             temperature=0.1
         )
         
         try:
-            return json.loads(consistent_response)
+            return _json_loads(consistent_response)
         except:
             return response  # Return original if parsing fails
     
@@ -413,16 +784,11 @@ class CAGAgent:
         issues = []
         
         # Check for common factual errors in IT support
-        fact_check_prompt = f"""
-        Check the technical accuracy of this response.
-        Identify any factual errors or misleading information.
-        
-        Response: {json.dumps(response.get('recommendations', [{}])[0], indent=2)[:500]}
-        
-        List any factual errors (one per line):
-        """
+        fact_check_prompt = self._FACT_CHECK_TEMPLATE.format_map({
+            "response_summary": _bounded_json_dumps(response.get('recommendations', [{}])[0])
+        })
         
-        fact_errors = await self.llm_service.generate(
+        fact_errors = await self._cached_generate(
             prompt=fact_check_prompt,
             max_tokens=300,
             temperature=0.2
@@ -450,16 +816,11 @@ class CAGAgent:
         issues_resolved_ratio = len(corrections) / max(len(issues), 1)
         
         # Get quality assessment from LLM
-        quality_prompt = f"""
-        Rate the quality of this incident response on a scale of 0-100.
-        Consider completeness, accuracy, clarity, and actionability.
-        
-        Response: {json.dumps(refined_response.get('recommendations', [{}])[0], indent=2)[:500]}
+        quality_prompt = self._QUALITY_TEMPLATE.format_map({
+            "response_summary": _bounded_json_dumps(refined_response.get('recommendations', [{}])[0])
+        })
         
-        Return only the numeric score:
-        """
-        
-        quality_score = await self.llm_service.generate(
+        quality_score = await self._cached_generate(
             prompt=quality_prompt,
             max_tokens=10,
             temperature=0.1
@@ -482,18 +843,22 @@ class CAGAgent:
     def _identify_improvements(
         self,
         original: Dict[str, Any],
-        refined: Dict[str, Any]
+        refined: Dict[str, Any],
+        corrections: List[Dict[str, Any]]
     ) -> List[str]:
         """
         Identify specific improvements made
         """
         improvements = []
         
-        # Check for added content
-        for key in refined:
+        # Check for added content. Only fields a correction targeted are
+        # compared by value; the consistency pass re-parses the whole
+        # response, so identity can't tell untouched fields apart.
+        targets = {correction.get('target_field') for correction in corrections}
+        for key, value in refined.items():
             if key not in original:
                 improvements.append(f"Added {key}")
-            elif refined[key] != original.get(key):
+            elif key in targets and value != original[key]:
                 improvements.append(f"Improved {key}")
         
         # Check for structural improvements
@@ -520,16 +885,15 @@ class CAGAgent:
         """
         Update learning components based on refinement results
         """
-        # Record correction patterns
-        correction_pattern = {
-            "incident_type": incident.category,
-            "iterations": response.total_iterations,
-            "improvement": response.improvement_percentage,
-            "final_confidence": response.final_confidence,
-            "timestamp": datetime.now().isoformat()
-        }
-        
-        self.correction_history.append(correction_pattern)
+        # Record correction patterns, overwriting the oldest once the ring is full
+        slot = self._history_next
+        self._history_iterations[slot] = response.total_iterations
+        self._history_improvement[slot] = response.improvement_percentage
+        self._history_confidence[slot] = response.final_confidence
+        self._history_incident_types[slot] = incident.category
+        self._history_timestamps[slot] = time.time_ns()
+        self._history_next = (slot + 1) % self.max_history
+        self._history_len = min(self._history_len + 1, self.max_history)
         
         # Identify success/failure patterns
         if response.final_confidence >= self.confidence_target:
@@ -543,12 +907,25 @@ class CAGAgent:
                 "issues": sum(len(it.issues_found) for it in response.iterations)
             })
         
-        # Trim history to prevent memory growth
-        max_history = 1000
-        if len(self.correction_history) > max_history:
-            self.correction_history = self.correction_history[-max_history:]
-        
-        logger.info(f"Learning updated: {len(self.correction_history)} patterns recorded")
+        logger.info(f"Learning updated: {self._history_len} patterns recorded")
+    
+    @property
+    def correction_history(self) -> List[Dict[str, Any]]:
+        """
+        Recorded correction patterns, oldest first
+        """
+        start = self._history_next if self._history_len == self.max_history else 0
+        slots = [(start + i) % self.max_history for i in range(self._history_len)]
+        return [
+            {
+                "incident_type": self._history_incident_types[i],
+                "iterations": int(self._history_iterations[i]),
+                "improvement": float(self._history_improvement[i]),
+                "final_confidence": float(self._history_confidence[i]),
+                "timestamp": datetime.fromtimestamp(self._history_timestamps[i] / 1e9).isoformat()
+            }
+            for i in slots
+        ]
     
     def _extract_pattern(self, incident: Incident) -> Dict[str, Any]:
         """
@@ -565,15 +942,20 @@ class CAGAgent:
         """
         Get statistics about CAG corrections
         """
-        if not self.correction_history:
+        n = self._history_len
+        if not n:
             return {"message": "No correction history available"}
         
-        avg_iterations = np.mean([h['iterations'] for h in self.correction_history])
-        avg_improvement = np.mean([h['improvement'] for h in self.correction_history])
-        success_rate = len(self.success_patterns) / max(len(self.correction_history), 1)
+        # Slot order doesn't matter for the means. sum()/n avoids the extra
+        # Python-level work ndarray.mean() does, which dominates at small n.
+        avg_iterations = float(self._history_iterations[:n].sum()) / n
+        avg_improvement = float(self._history_improvement[:n].sum()) / n
+        # Derived from the same window as the averages; the pattern deques
+        # are capped separately so their length can't be used here
+        success_rate = int(np.count_nonzero(self._history_confidence[:n] >= self.confidence_target)) / n
         
         return {
-            "total_corrections": len(self.correction_history),
+            "total_corrections": n,
             "average_iterations": avg_iterations,
             "average_improvement": avg_improvement,
             "success_rate": success_rate,
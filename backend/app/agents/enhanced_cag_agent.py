@@ -4,20 +4,53 @@ Multi-stage refinement with domain-specific critics and self-consistency verific
 """
 
 import asyncio
+import hashlib
 import json
-from typing import List, Dict, Any, Optional, Tuple
+import math
+import re
+import time
+from itertools import chain, islice
+from collections import Counter, OrderedDict, defaultdict, deque
+from typing import List, Dict, Any, Optional, Tuple, ClassVar
 from datetime import datetime
-from dataclasses import dataclass, field
-import numpy as np
+from dataclasses import dataclass, field, replace
 import logging
-from abc import ABC, abstractmethod
 
-from app.services.llm_service import LLMService
+from app.services.llm_service import LLMService, is_cacheable_response
 from app.models.incident import Incident
 from app.utils.validation import ResponseValidator
 
 logger = logging.getLogger(__name__)
 
+# Critic severities, least to most severe
+_SEVERITIES = ('low', 'medium', 'high', 'critical')
+
+# Health score multiplier per critic severity (unknown severities get 0.8)
+_SEVERITY_MUL = {
+    'low': 1.0,
+    'medium': 0.9,
+    'high': 0.7,
+    'critical': 0.5
+}
+
+# Confidence penalty per reported issue, by critic severity (others get 0.05)
+_SEVERITY_ISSUE_W = {
+    'critical': 0.20
+}
+
+# JSON schema for a critic reply, passed as the LLM response format so the
+# model's output is constrained to a parseable evaluation
+CRITIC_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "score": {"type": "number", "minimum": 0, "maximum": 100},
+        "issues": {"type": "array", "items": {"type": "string"}},
+        "suggestions": {"type": "array", "items": {"type": "string"}},
+        "severity": {"type": "string", "enum": list(_SEVERITIES)}
+    },
+    "required": ["score", "issues", "suggestions", "severity"]
+}
+
 
 @dataclass
 class CriticEvaluation:
@@ -28,6 +61,7 @@ class CriticEvaluation:
     suggestions: List[str]
     severity: str  # "low", "medium", "high", "critical"
     processing_time: float
+    reused: bool = False  # Carried over from the previous stage instead of re-run
 
 
 @dataclass
@@ -58,111 +92,123 @@ class EnhancedCAGResponse:
     metadata: Dict[str, Any]
 
 
-class BaseCritic(ABC):
-    """Base class for all critics"""
+# orjson is several times faster than stdlib json for the response payloads
+# serialized and parsed every stage; fall back to json when unavailable
+try:
+    import orjson
 
-    def __init__(self, llm_service: LLMService, weight: float = 1.0):
-        self.llm_service = llm_service
-        self.weight = weight
-        self.evaluation_count = 0
+    _json_loads = orjson.loads
 
-    @abstractmethod
-    async def evaluate(self, incident: Incident, response: Dict[str, Any]) -> CriticEvaluation:
-        """Evaluate response and return critique"""
-        pass
+    def _json_dumps_indented(obj: Any) -> str:
+        return orjson.dumps(
+            obj,
+            option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        ).decode()
+except ImportError:
+    _json_loads = json.loads
 
-    @abstractmethod
-    def get_name(self) -> str:
-        """Get critic name"""
-        pass
+    def _json_dumps_indented(obj: Any) -> str:
+        return json.dumps(obj, indent=2)
 
 
-class TechnicalAccuracyCritic(BaseCritic):
-    """Evaluates technical accuracy and correctness"""
+def _recommendations_json(response: Dict[str, Any]) -> str:
+    """Serialize the recommendations as they appear in critic and correction prompts"""
+    return _json_dumps_indented(response.get('recommendations', []))[:1500]
 
-    def get_name(self) -> str:
-        return "technical_accuracy"
 
-    async def evaluate(self, incident: Incident, response: Dict[str, Any]) -> CriticEvaluation:
-        start_time = datetime.now()
+def _recommendation_text(response: Dict[str, Any]) -> str:
+    """Plain text of the recommendations, for embedding"""
+    parts = []
+    for rec in response.get('recommendations', []):
+        for value in (rec.values() if isinstance(rec, dict) else [rec]):
+            if isinstance(value, str):
+                parts.append(value)
+            elif isinstance(value, list):
+                parts.extend(str(item) for item in value)
+    return " ".join(parts)
+
+
+# A numbered line ("1. Restart the service", "2) Check logs") in free-text solutions
+_NUMBERED_STEP = re.compile(r'^\s*\d+[.)]\s*(.+?)\s*$', re.MULTILINE)
+
+
+def _canonical_step(step: Any) -> str:
+    """Case- and whitespace-insensitive key for comparing solution steps"""
+    return ' '.join(str(step).lower().split())[:200]
 
-        prompt = f"""
-        As a technical accuracy expert, evaluate the following incident response for technical correctness.
 
+def _build_incident_prefix(
+    incident: Incident,
+    response: Dict[str, Any],
+    recs_json: Optional[str] = None
+) -> str:
+    """
+    Incident and response block that every critic prompt starts with
+
+    It is built once per stage and kept at the front of the prompt so the LLM
+    server can reuse the evaluated prefix across critics.
+    """
+    if recs_json is None:
+        recs_json = _recommendations_json(response)
+
+    return f"""
         Incident Details:
         - Title: {incident.title}
         - Category: {incident.category}
+        - Priority: {incident.priority}
         - Description: {incident.description}
         - Error Message: {incident.error_message or "N/A"}
+        - Affected Systems: {', '.join(incident.affected_systems) if incident.affected_systems else 'N/A'}
 
         Response to Evaluate:
-        {json.dumps(response.get('recommendations', [{}])[0] if response.get('recommendations') else {}, indent=2)}
-
-        Evaluate for:
-        1. Technical correctness of commands and procedures
-        2. Accuracy of error diagnosis
-        3. Validity of proposed solutions
-        4. Correct use of technical terminology
-        5. Alignment with best practices
-
-        Provide your evaluation in JSON format:
-        {{
-            "score": <0-100>,
-            "issues": ["issue1", "issue2"],
-            "suggestions": ["suggestion1", "suggestion2"],
-            "severity": "low|medium|high|critical"
-        }}
+        {recs_json}
         """
 
-        result = await self.llm_service.generate(
-            prompt=prompt,
-            max_tokens=600,
-            temperature=0.2
-        )
-
-        try:
-            eval_data = json.loads(result)
-            score = float(eval_data.get('score', 70)) / 100
-            issues = eval_data.get('issues', [])
-            suggestions = eval_data.get('suggestions', [])
-            severity = eval_data.get('severity', 'medium')
-        except:
-            score = 0.7
-            issues = ["Could not parse technical evaluation"]
-            suggestions = ["Review technical details manually"]
-            severity = "medium"
 
-        self.evaluation_count += 1
-        processing_time = (datetime.now() - start_time).total_seconds()
+class _TokenBudget:
+    """
+    Per call site max_tokens sized from observed completion lengths.
 
-        return CriticEvaluation(
-            critic_name=self.get_name(),
-            score=score,
-            issues=issues,
-            suggestions=suggestions,
-            severity=severity,
-            processing_time=processing_time
-        )
+    Budgets start at each call site's default and shrink to 1.3x the p95 of
+    recent completions once enough have been seen, so the LLM server doesn't
+    reserve KV cache for output that never comes. A completion that hits its
+    budget pushes the p95 back up, and the default is never exceeded.
+    """
 
+    def __init__(self, window: int = 256, min_samples: int = 20, floor: int = 80):
+        self.min_samples = min_samples
+        self.floor = floor
+        self._lengths: Dict[str, deque] = defaultdict(lambda: deque(maxlen=window))
 
-class CompletenessCritic(BaseCritic):
-    """Evaluates completeness and thoroughness"""
+    def limit(self, site: str, default: int) -> int:
+        """Get max_tokens for a call site"""
+        lengths = self._lengths.get(site)
+        if lengths is None or len(lengths) < self.min_samples:
+            return default
+        p95 = sorted(lengths)[int(0.95 * (len(lengths) - 1))]
+        return min(default, max(self.floor, math.ceil(1.3 * p95)))
 
-    def get_name(self) -> str:
-        return "completeness"
+    def observe(self, site: str, text: Optional[str], count: int = 1):
+        """Record a completion; `count` splits a batched reply into per-item lengths"""
+        if text:
+            # ~4 characters per token is close enough for sizing budgets
+            self._lengths[site].append(len(text) / 4 / count)
 
-    async def evaluate(self, incident: Incident, response: Dict[str, Any]) -> CriticEvaluation:
-        start_time = datetime.now()
 
-        prompt = f"""
-        As a completeness expert, evaluate if the incident response is thorough and complete.
+# Critic rubrics; each follows the incident prefix in the critic prompt
+_TECHNICAL_ACCURACY_RUBRIC = """
+        As a technical accuracy expert, evaluate the incident response for technical correctness.
 
-        Incident: {incident.title}
-        Priority: {incident.priority}
-        Systems: {', '.join(incident.affected_systems) if incident.affected_systems else 'N/A'}
+        Evaluate for:
+        1. Technical correctness of commands and procedures
+        2. Accuracy of error diagnosis
+        3. Validity of proposed solutions
+        4. Correct use of technical terminology
+        5. Alignment with best practices
+        """
 
-        Response to Evaluate:
-        {json.dumps(response.get('recommendations', []), indent=2)[:1000]}
+_COMPLETENESS_RUBRIC = """
+        As a completeness expert, evaluate if the incident response is thorough and complete.
 
         Check for:
         1. All aspects of the incident addressed
@@ -171,64 +217,11 @@ class CompletenessCritic(BaseCritic):
         4. Escalation path defined
         5. Verification steps included
         6. Rollback plan if applicable
-
-        Provide evaluation in JSON format:
-        {{
-            "score": <0-100>,
-            "issues": ["missing element 1", "missing element 2"],
-            "suggestions": ["add suggestion 1", "add suggestion 2"],
-            "severity": "low|medium|high|critical"
-        }}
         """
 
-        result = await self.llm_service.generate(
-            prompt=prompt,
-            max_tokens=600,
-            temperature=0.2
-        )
-
-        try:
-            eval_data = json.loads(result)
-            score = float(eval_data.get('score', 70)) / 100
-            issues = eval_data.get('issues', [])
-            suggestions = eval_data.get('suggestions', [])
-            severity = eval_data.get('severity', 'medium')
-        except:
-            score = 0.7
-            issues = ["Could not parse completeness evaluation"]
-            suggestions = ["Review for missing elements"]
-            severity = "medium"
-
-        self.evaluation_count += 1
-        processing_time = (datetime.now() - start_time).total_seconds()
-
-        return CriticEvaluation(
-            critic_name=self.get_name(),
-            score=score,
-            issues=issues,
-            suggestions=suggestions,
-            severity=severity,
-            processing_time=processing_time
-        )
-
-
-class SafetyCritic(BaseCritic):
-    """Evaluates safety and risk considerations"""
-
-    def get_name(self) -> str:
-        return "safety"
-
-    async def evaluate(self, incident: Incident, response: Dict[str, Any]) -> CriticEvaluation:
-        start_time = datetime.now()
-
-        prompt = f"""
+_SAFETY_RUBRIC = """
         As a safety and risk expert, evaluate the incident response for potential risks.
 
-        Incident: {incident.title} (Priority: {incident.priority})
-
-        Proposed Solution:
-        {json.dumps(response.get('recommendations', [{}])[0] if response.get('recommendations') else {}, indent=2)}
-
         Evaluate for:
         1. Potential data loss risks
         2. System downtime implications
@@ -236,39 +229,98 @@ class SafetyCritic(BaseCritic):
         4. Impact on other systems
         5. User impact
         6. Reversibility of changes
+        """
+
+_CLARITY_RUBRIC = """
+        As a clarity expert, evaluate if the incident response is clear and actionable.
+
+        Evaluate for:
+        1. Clear step-by-step instructions
+        2. Unambiguous language
+        3. Proper formatting and structure
+        4. Actionable recommendations
+        5. Appropriate technical level for audience
+        6. Examples where helpful
+        """
 
-        Provide evaluation in JSON format:
-        {{
+_CRITIC_EVAL_FORMAT = """
+        Provide your evaluation in JSON format:
+        {
             "score": <0-100>,
-            "issues": ["risk 1", "risk 2"],
-            "suggestions": ["mitigation 1", "mitigation 2"],
+            "issues": ["issue1", "issue2"],
+            "suggestions": ["suggestion1", "suggestion2"],
             "severity": "low|medium|high|critical"
-        }}
+        }
         """
 
+
+@dataclass
+class Critic:
+    """
+    A specialized critic: the rubric the LLM scores a response against, and
+    the evaluation to fall back on when its reply cannot be parsed
+    """
+    name: str
+    rubric: str
+    default_score: float
+    default_severity: str
+    llm_service: LLMService = field(repr=False)
+    weight: float = 1.0
+    token_budget: Optional[_TokenBudget] = field(default=None, repr=False)
+    evaluation_count: int = field(default=0, init=False)
+
+    async def evaluate(
+        self,
+        incident: Incident,
+        response: Dict[str, Any],
+        prefix: Optional[str] = None
+    ) -> CriticEvaluation:
+        """Evaluate response and return critique"""
+        start_time = time.perf_counter()
+
+        if prefix is None:
+            prefix = _build_incident_prefix(incident, response)
+
+        prompt = prefix + self.rubric + _CRITIC_EVAL_FORMAT
+
+        # Schema-constrained output has no prose around the JSON, so the
+        # token budget only needs to cover the evaluation itself
+        max_tokens = self.token_budget.limit('critic', 300) if self.token_budget else 300
         result = await self.llm_service.generate(
             prompt=prompt,
-            max_tokens=600,
-            temperature=0.2
+            max_tokens=max_tokens,
+            temperature=0.2,
+            response_format=CRITIC_SCHEMA
         )
+        if self.token_budget:
+            self.token_budget.observe('critic', result)
 
         try:
-            eval_data = json.loads(result)
-            score = float(eval_data.get('score', 80)) / 100
+            eval_data = _json_loads(result)
+        except:
+            eval_data = None
+
+        processing_time = time.perf_counter() - start_time
+        return self.build_evaluation(eval_data, processing_time)
+
+    def build_evaluation(self, eval_data: Any, processing_time: float) -> CriticEvaluation:
+        """Turn a parsed LLM evaluation into a CriticEvaluation, falling back to defaults"""
+        try:
+            score = float(eval_data.get('score', self.default_score * 100)) / 100
             issues = eval_data.get('issues', [])
             suggestions = eval_data.get('suggestions', [])
-            severity = eval_data.get('severity', 'low')
+            severity = eval_data.get('severity', self.default_severity)
         except:
-            score = 0.8
-            issues = ["Could not parse safety evaluation"]
-            suggestions = ["Review safety considerations manually"]
-            severity = "low"
+            label = self.name.replace('_', ' ')
+            score = self.default_score
+            issues = [f"Could not parse {label} evaluation"]
+            suggestions = [f"Review {label} manually"]
+            severity = self.default_severity
 
         self.evaluation_count += 1
-        processing_time = (datetime.now() - start_time).total_seconds()
 
         return CriticEvaluation(
-            critic_name=self.get_name(),
+            critic_name=self.name,
             score=score,
             issues=issues,
             suggestions=suggestions,
@@ -277,67 +329,181 @@ class SafetyCritic(BaseCritic):
         )
 
 
-class ClarityCritic(BaseCritic):
-    """Evaluates clarity and actionability"""
+class _CachedLLM:
+    """
+    Wraps the LLM service with an LRU cache of low-temperature completions.
 
-    def get_name(self) -> str:
-        return "clarity"
+    Entries are keyed by a blake2b digest of the prompt and generation
+    settings, so re-evaluating an unchanged response (a reprocessed incident,
+    a critic re-run on the same text) is a dict lookup. Sampled calls above
+    max_temperature always go to the LLM.
+    """
 
-    async def evaluate(self, incident: Incident, response: Dict[str, Any]) -> CriticEvaluation:
-        start_time = datetime.now()
+    def __init__(self, llm_service: LLMService, max_size: int = 1024, max_temperature: float = 0.2):
+        self.llm_service = llm_service
+        self.max_size = max_size
+        self.max_temperature = max_temperature
+        self._entries: "OrderedDict[bytes, str]" = OrderedDict()
 
-        prompt = f"""
-        As a clarity expert, evaluate if the incident response is clear and actionable.
+    def __getattr__(self, name):
+        # Everything other than generate() goes straight to the wrapped service
+        return getattr(self.llm_service, name)
 
-        Response to Evaluate:
-        {json.dumps(response.get('recommendations', []), indent=2)[:1000]}
+    async def generate(
+        self,
+        prompt: str,
+        max_tokens: int = 1024,
+        temperature: float = 0.7,
+        **kwargs
+    ) -> str:
+        """Generate text, reusing the completion of an identical earlier request"""
+        if temperature > self.max_temperature:
+            return await self.llm_service.generate(
+                prompt=prompt,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                **kwargs
+            )
 
-        Evaluate for:
-        1. Clear step-by-step instructions
-        2. Unambiguous language
-        3. Proper formatting and structure
-        4. Actionable recommendations
-        5. Appropriate technical level for audience
-        6. Examples where helpful
+        digest = hashlib.blake2b(prompt.encode(), digest_size=16)
+        digest.update(repr((max_tokens, temperature, sorted(kwargs.items()))).encode())
+        key = digest.digest()
 
-        Provide evaluation in JSON format:
-        {{
-            "score": <0-100>,
-            "issues": ["clarity issue 1", "clarity issue 2"],
-            "suggestions": ["clarity improvement 1", "clarity improvement 2"],
-            "severity": "low|medium|high|critical"
-        }}
-        """
+        cached = self._entries.get(key)
+        if cached is not None:
+            self._entries.move_to_end(key)
+            return cached
 
         result = await self.llm_service.generate(
             prompt=prompt,
-            max_tokens=600,
-            temperature=0.2
+            max_tokens=max_tokens,
+            temperature=temperature,
+            **kwargs
         )
 
+        # Fallback text from a failed call would outlive the outage
+        if is_cacheable_response(result):
+            self._entries[key] = result
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+        return result
+
+
+class BatchedCriticRunner:
+    """
+    Runs every critic in a single LLM call.
+
+    The incident and response are sent once, followed by each critic's rubric,
+    and the reply is a JSON array with one evaluation per critic. Critics
+    missing from the reply are evaluated individually.
+    """
+
+    _BATCH_FORMAT: ClassVar[str] = """
+        Provide your evaluations as a JSON array with one object per perspective:
+        [
+            {
+                "critic_name": "<perspective name>",
+                "score": <0-100>,
+                "issues": ["issue1", "issue2"],
+                "suggestions": ["suggestion1", "suggestion2"],
+                "severity": "low|medium|high|critical"
+            }
+        ]
+        """
+
+    def __init__(
+        self,
+        llm_service: LLMService,
+        critics: Dict[str, Critic],
+        token_budget: Optional[_TokenBudget] = None
+    ):
+        self.llm_service = llm_service
+        self.critics = critics
+        self.token_budget = token_budget or _TokenBudget()
+
+        # Prompt tail and reply schema per critic subset; everything after the
+        # incident prefix is fixed for a given set of critics
+        self._batch_specs: Dict[Tuple[str, ...], Tuple[str, Dict[str, Any]]] = {}
+
+    def _batch_spec(self, names: Tuple[str, ...]) -> Tuple[str, Dict[str, Any]]:
+        """Get the prompt tail and reply schema for a set of critics"""
+        spec = self._batch_specs.get(names)
+        if spec is None:
+            rubrics = "".join(
+                f"""
+        Perspective {i}: {name}{self.critics[name].rubric}"""
+                for i, name in enumerate(names, 1)
+            )
+            prompt_tail = f"""
+        Evaluate the incident response above from {len(names)} expert perspectives.
+        {rubrics}""" + self._BATCH_FORMAT
+
+            schema = {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "critic_name": {"type": "string", "enum": list(names)},
+                        **CRITIC_SCHEMA["properties"]
+                    },
+                    "required": ["critic_name", *CRITIC_SCHEMA["required"]]
+                },
+                "minItems": len(names),
+                "maxItems": len(names)
+            }
+            spec = self._batch_specs[names] = (prompt_tail, schema)
+        return spec
+
+    async def run(
+        self,
+        incident: Incident,
+        response: Dict[str, Any],
+        prefix: Optional[str] = None,
+        names: Optional[Tuple[str, ...]] = None
+    ) -> List[CriticEvaluation]:
+        """Evaluate response with the named critics (all critics by default)"""
+        if prefix is None:
+            prefix = _build_incident_prefix(incident, response)
+        if names is None:
+            names = tuple(self.critics)
+
+        start_time = time.perf_counter()
+
+        prompt_tail, schema = self._batch_spec(names)
+        prompt = prefix + prompt_tail
+
+        parsed = {}
         try:
-            eval_data = json.loads(result)
-            score = float(eval_data.get('score', 75)) / 100
-            issues = eval_data.get('issues', [])
-            suggestions = eval_data.get('suggestions', [])
-            severity = eval_data.get('severity', 'low')
-        except:
-            score = 0.75
-            issues = ["Could not parse clarity evaluation"]
-            suggestions = ["Review for clarity improvements"]
-            severity = "low"
+            result = await self.llm_service.generate(
+                prompt=prompt,
+                max_tokens=self.token_budget.limit('critic_batch', 300) * len(names),
+                temperature=0.2,
+                response_format=schema
+            )
+            self.token_budget.observe('critic_batch', result, count=len(names))
+            for eval_data in _json_loads(result):
+                if isinstance(eval_data, dict) and eval_data.get('critic_name') in names:
+                    parsed[eval_data['critic_name']] = eval_data
+        except Exception as e:
+            logger.warning(f"Batched critic evaluation failed, evaluating critics individually: {e}")
+
+        processing_time = time.perf_counter() - start_time
+        evaluations = [
+            self.critics[name].build_evaluation(eval_data, processing_time)
+            for name, eval_data in parsed.items()
+        ]
 
-        self.evaluation_count += 1
-        processing_time = (datetime.now() - start_time).total_seconds()
+        # Fall back to one call per critic for anything the batched reply missed
+        missing = [self.critics[name] for name in names if name not in parsed]
+        if missing:
+            fallback = await asyncio.gather(
+                *[critic.evaluate(incident, response, prefix) for critic in missing],
+                return_exceptions=True
+            )
+            evaluations.extend(e for e in fallback if isinstance(e, CriticEvaluation))
 
-        return CriticEvaluation(
-            critic_name=self.get_name(),
-            score=score,
-            issues=issues,
-            suggestions=suggestions,
-            severity=severity,
-            processing_time=processing_time
-        )
+        return evaluations
 
 
 class EnhancedCAGAgent:
@@ -348,45 +514,102 @@ class EnhancedCAGAgent:
     def __init__(
         self,
         llm_service: LLMService,
-        config: Optional[Dict] = None
+        config: Optional[Dict] = None,
+        embedder=None
     ):
-        self.llm_service = llm_service
         self.validator = ResponseValidator()
 
         # Configuration
         self.config = config or {}
+
+        # Critic and judge prompts are deterministic enough to reuse verbatim
+        if self.config.get('enable_llm_cache', True):
+            llm_service = _CachedLLM(
+                llm_service,
+                max_size=self.config.get('llm_cache_size', 1024)
+            )
+        self.llm_service = llm_service
         self.max_stages = self.config.get('max_stages', 2)
         self.confidence_target = self.config.get('confidence_target', 0.85)
         self.enable_consistency_verification = self.config.get('enable_consistency_verification', True)
         self.n_alternatives = self.config.get('n_alternatives', 2)
         self.consistency_threshold = self.config.get('consistency_threshold', 0.7)
+        self.batch_critics = self.config.get('batch_critics', True)
+        # Skip critics that already scored above target in the previous stage
+        self.critic_early_exit = self.config.get('critic_early_exit', True)
+        # 'embedding' scores consistency by cosine similarity, 'llm' asks the LLM to judge
+        self.consistency_mode = self.config.get('consistency_mode', 'embedding')
+        # 'union' merges alternatives deterministically, 'llm' asks the LLM to merge
+        self.merge_mode = self.config.get('merge_mode', 'union')
+
+        # Sentence embedder for consistency scoring, loaded on first use
+        self._embedder = embedder
+        self._embedder_loaded = embedder is not None
+        self._embedder_lock = asyncio.Lock()
+
+        # Output token budgets per call site, learned from completion lengths
+        self.token_budget = _TokenBudget()
 
         # Initialize critics
         self.critics = self._initialize_critics()
+        self._critic_weights = {name: critic.weight for name, critic in self.critics.items()}
+        self.batched_critics = BatchedCriticRunner(self.llm_service, self.critics, self.token_budget)
 
         # Learning and metrics
-        self.refinement_history = []
-        self.critic_performance = {name: [] for name in self.critics.keys()}
+        self.refinement_history = deque(maxlen=self.config.get('history_max', 1000))
+        self.critic_performance = {
+            name: deque(maxlen=self.config.get('critic_history_max', 5000))
+            for name in self.critics.keys()
+        }
+
+        # Running aggregates so get_stats doesn't rescan the history
+        self._agg_stages_sum = 0
+        self._agg_improvement_sum = 0.0
+        self._agg_consistency_sum = 0.0
+        self._critic_agg = {
+            name: {'n': 0, 'score_sum': 0.0, 'time_sum': 0.0, 'sev_counts': Counter()}
+            for name in self.critics.keys()
+        }
 
         logger.info(f"Enhanced CAG Agent initialized with {len(self.critics)} critics")
 
-    def _initialize_critics(self) -> Dict[str, BaseCritic]:
+    def _initialize_critics(self) -> Dict[str, Critic]:
         """Initialize all specialized critics"""
         return {
-            'technical_accuracy': TechnicalAccuracyCritic(
-                self.llm_service,
+            'technical_accuracy': Critic(
+                name='technical_accuracy',
+                rubric=_TECHNICAL_ACCURACY_RUBRIC,
+                default_score=0.7,
+                default_severity='medium',
+                llm_service=self.llm_service,
+                token_budget=self.token_budget,
                 weight=self.config.get('technical_weight', 1.5)
             ),
-            'completeness': CompletenessCritic(
-                self.llm_service,
+            'completeness': Critic(
+                name='completeness',
+                rubric=_COMPLETENESS_RUBRIC,
+                default_score=0.7,
+                default_severity='medium',
+                llm_service=self.llm_service,
+                token_budget=self.token_budget,
                 weight=self.config.get('completeness_weight', 1.2)
             ),
-            'safety': SafetyCritic(
-                self.llm_service,
+            'safety': Critic(
+                name='safety',
+                rubric=_SAFETY_RUBRIC,
+                default_score=0.8,
+                default_severity='low',
+                llm_service=self.llm_service,
+                token_budget=self.token_budget,
                 weight=self.config.get('safety_weight', 1.3)
             ),
-            'clarity': ClarityCritic(
-                self.llm_service,
+            'clarity': Critic(
+                name='clarity',
+                rubric=_CLARITY_RUBRIC,
+                default_score=0.75,
+                default_severity='low',
+                llm_service=self.llm_service,
+                token_budget=self.token_budget,
                 weight=self.config.get('clarity_weight', 1.0)
             )
         }
@@ -400,10 +623,11 @@ class EnhancedCAGAgent:
         """
         Main refinement method with multi-stage critic-based refinement
         """
-        start_time = datetime.now()
+        start_time = time.perf_counter()
         stages = []
         current_response = initial_response
         current_confidence = initial_confidence
+        converged_evaluations = []
 
         logger.info(f"Starting enhanced CAG refinement with {self.max_stages} stages")
 
@@ -411,11 +635,19 @@ class EnhancedCAGAgent:
             stage_name = f"Stage {stage_num + 1}: Multi-Critic Evaluation"
             logger.info(f"{stage_name} - Current confidence: {current_confidence:.2f}")
 
+            # Serialize the response once; the critics and the correction prompt share it
+            recs_json = _recommendations_json(current_response)
+
             # Run all critics in parallel
-            critic_evaluations = await self._run_critics(incident, current_response)
+            critic_evaluations = await self._run_critics(
+                incident,
+                current_response,
+                recs_json,
+                converged=converged_evaluations
+            )
 
-            # Calculate overall health score
-            health_score = self._calculate_health_score(critic_evaluations)
+            # Calculate overall health score and issue penalty
+            health_score, issue_penalty = self._score_and_penalty(critic_evaluations)
 
             # Check if refinement is needed
             if health_score >= self.confidence_target and current_confidence >= self.confidence_target:
@@ -426,14 +658,15 @@ class EnhancedCAGAgent:
             corrections, refined_response = await self._apply_targeted_corrections(
                 incident,
                 current_response,
-                critic_evaluations
+                critic_evaluations,
+                recs_json
             )
 
             # Calculate new confidence
             new_confidence = self._calculate_refined_confidence(
                 current_confidence,
                 health_score,
-                critic_evaluations
+                issue_penalty
             )
 
             # Record stage
@@ -451,12 +684,20 @@ class EnhancedCAGAgent:
             stages.append(stage)
 
             # Update for next iteration
+            delta = new_confidence - current_confidence
             current_response = refined_response
             current_confidence = new_confidence
-
-            # Check convergence
-            if abs(new_confidence - current_confidence) < 0.01:
-                logger.info("Convergence reached")
+            if self.critic_early_exit:
+                converged_evaluations = [
+                    e for e in critic_evaluations
+                    if e.score >= self.confidence_target
+                ]
+
+            # Check convergence: the stage barely moved confidence, or lost
+            # some while already close to target. Either way another stage is
+            # unlikely to pay for its critic calls
+            if abs(delta) < 0.01 or (delta < 0 and current_confidence >= 0.8 * self.confidence_target):
+                logger.info(f"Convergence reached: last stage changed confidence by {delta:+.3f}")
                 break
 
         # Self-consistency verification
@@ -472,10 +713,10 @@ class EnhancedCAGAgent:
             # If consistency is low, merge consistent parts
             if consistency_score < self.consistency_threshold:
                 logger.info(f"Low consistency ({consistency_score:.2f}), merging alternatives")
-                current_response = await self._merge_consistent_parts(
-                    current_response,
-                    alternatives
-                )
+                if self.merge_mode == 'llm':
+                    current_response = await self._merge_with_llm(current_response, alternatives)
+                else:
+                    current_response = self._merge_consistent_parts(current_response, alternatives)
 
         # Calculate improvement
         improvement = ((current_confidence - initial_confidence) / initial_confidence) * 100 if initial_confidence > 0 else 0
@@ -492,7 +733,7 @@ class EnhancedCAGAgent:
             alternative_solutions=alternatives,
             metadata={
                 "initial_confidence": initial_confidence,
-                "processing_time": (datetime.now() - start_time).total_seconds(),
+                "processing_time": time.perf_counter() - start_time,
                 "critics_used": list(self.critics.keys()),
                 "converged": current_confidence >= self.confidence_target,
                 "consistency_verified": self.enable_consistency_verification,
@@ -511,75 +752,123 @@ class EnhancedCAGAgent:
 
         return response
 
+    async def refine_batch(
+        self,
+        items: List[Tuple[Incident, Dict[str, Any], float]],
+        concurrency: int = 16
+    ) -> List[EnhancedCAGResponse]:
+        """
+        Refine several incidents concurrently
+
+        Each item is an (incident, initial_response, initial_confidence) tuple.
+        Refinements are LLM-bound, so overlapping them keeps the LLM server
+        busy; at most `concurrency` run at once. Results keep the input order.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def refine_one(item: Tuple[Incident, Dict[str, Any], float]) -> EnhancedCAGResponse:
+            async with semaphore:
+                return await self.refine(*item)
+
+        return await asyncio.gather(*[refine_one(item) for item in items])
+
     async def _run_critics(
         self,
         incident: Incident,
-        response: Dict[str, Any]
+        response: Dict[str, Any],
+        recs_json: Optional[str] = None,
+        converged: Optional[List[CriticEvaluation]] = None
     ) -> List[CriticEvaluation]:
-        """Run all critics in parallel"""
-        tasks = [
-            critic.evaluate(incident, response)
-            for critic in self.critics.values()
-        ]
-
-        evaluations = await asyncio.gather(*tasks, return_exceptions=True)
+        """
+        Run all critics, in one batched call or in parallel calls
 
-        # Filter out exceptions
-        valid_evaluations = [
-            e for e in evaluations
-            if isinstance(e, CriticEvaluation)
+        Evaluations in `converged` (critics that already met the target in the
+        previous stage) are carried over instead of being run again.
+        """
+        reused = [
+            replace(e, processing_time=0.0, reused=True)
+            for e in converged or []
+            if e.critic_name in self.critics
         ]
+        skip = {e.critic_name for e in reused}
+        names = tuple(name for name in self.critics if name not in skip)
+        if not names:
+            return reused
+
+        # Shared by every critic prompt this stage
+        prefix = _build_incident_prefix(incident, response, recs_json)
+
+        if self.batch_critics:
+            valid_evaluations = await self.batched_critics.run(incident, response, prefix, names)
+        else:
+            tasks = [
+                self.critics[name].evaluate(incident, response, prefix)
+                for name in names
+            ]
+
+            evaluations = await asyncio.gather(*tasks, return_exceptions=True)
+
+            # Filter out exceptions
+            valid_evaluations = [
+                e for e in evaluations
+                if isinstance(e, CriticEvaluation)
+            ]
+
+        if reused:
+            logger.info(f"Reused {len(reused)} converged critic evaluations")
+            valid_evaluations.extend(reused)
 
         logger.info(f"Completed {len(valid_evaluations)}/{len(self.critics)} critic evaluations")
         return valid_evaluations
 
-    def _calculate_health_score(self, evaluations: List[CriticEvaluation]) -> float:
-        """Calculate overall health score from critic evaluations"""
+    def _score_and_penalty(self, evaluations: List[CriticEvaluation]) -> Tuple[float, float]:
+        """
+        Calculate the overall health score and the issue penalty in one pass
+
+        The health score is the weighted, severity-adjusted critic score; the
+        penalty is based on the number and severity of issues, capped at 0.5.
+        """
         if not evaluations:
-            return 0.5
+            return 0.5, 0.0
 
-        weighted_scores = []
-        total_weight = 0
+        critic_weights = self._critic_weights
+        weighted_sum = 0.0
+        total_weight = 0.0
+        penalty = 0.0
 
         for evaluation in evaluations:
-            critic = self.critics.get(evaluation.critic_name)
-            if critic:
-                weight = critic.weight
+            weight = critic_weights.get(evaluation.critic_name)
+            if weight is not None:
                 # Apply severity penalty
-                severity_multiplier = {
-                    'low': 1.0,
-                    'medium': 0.9,
-                    'high': 0.7,
-                    'critical': 0.5
-                }.get(evaluation.severity, 0.8)
-
-                weighted_scores.append(evaluation.score * weight * severity_multiplier)
+                weighted_sum += evaluation.score * weight * _SEVERITY_MUL.get(evaluation.severity, 0.8)
                 total_weight += weight
+            penalty += len(evaluation.issues) * _SEVERITY_ISSUE_W.get(evaluation.severity, 0.05)
 
-        health_score = sum(weighted_scores) / total_weight if total_weight > 0 else 0.5
-        return min(max(health_score, 0.0), 1.0)
+        health_score = weighted_sum / total_weight if total_weight > 0 else 0.5
+        return min(max(health_score, 0.0), 1.0), min(penalty, 0.5)  # Cap at 50% penalty
 
     async def _apply_targeted_corrections(
         self,
         incident: Incident,
         response: Dict[str, Any],
-        evaluations: List[CriticEvaluation]
+        evaluations: List[CriticEvaluation],
+        recs_json: Optional[str] = None
     ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
         """Apply corrections based on critic feedback"""
         corrections = []
-
-        # Collect all issues and suggestions
-        all_issues = []
-        all_suggestions = []
-        for eval in evaluations:
-            all_issues.extend([
-                f"[{eval.critic_name}] {issue}"
-                for issue in eval.issues
-            ])
-            all_suggestions.extend([
-                f"[{eval.critic_name}] {sug}"
-                for sug in eval.suggestions
-            ])
+        if recs_json is None:
+            recs_json = _recommendations_json(response)
+
+        # Only the first 10 issues and suggestions go into the prompt, so
+        # format just those instead of the full lists
+        top_issues = list(islice(chain.from_iterable(
+            (f"[{e.critic_name}] {issue}" for issue in e.issues)
+            for e in evaluations
+        ), 10))
+        top_suggestions = list(islice(chain.from_iterable(
+            (f"[{e.critic_name}] {sug}" for sug in e.suggestions)
+            for e in evaluations
+        ), 10))
 
         # Generate comprehensive correction
         correction_prompt = f"""
@@ -589,13 +878,13 @@ class EnhancedCAGAgent:
         Description: {incident.description}
 
         Current Response:
-        {json.dumps(response.get('recommendations', []), indent=2)[:1500]}
+        {recs_json}
 
         Issues Identified:
-        {chr(10).join(all_issues[:10])}
+        {chr(10).join(top_issues)}
 
         Improvement Suggestions:
-        {chr(10).join(all_suggestions[:10])}
+        {chr(10).join(top_suggestions)}
 
         Provide an improved response maintaining the same JSON structure.
         Focus on addressing the most critical issues first.
@@ -603,16 +892,17 @@ class EnhancedCAGAgent:
 
         refined = await self.llm_service.generate(
             prompt=correction_prompt,
-            max_tokens=1500,
+            max_tokens=self.token_budget.limit('correction', 1500),
             temperature=0.3
         )
+        self.token_budget.observe('correction', refined)
 
         try:
-            refined_response = json.loads(refined)
+            refined_response = _json_loads(refined)
             corrections.append({
                 "type": "comprehensive_refinement",
-                "issues_addressed": len(all_issues),
-                "suggestions_applied": len(all_suggestions)
+                "issues_addressed": sum(len(e.issues) for e in evaluations),
+                "suggestions_applied": sum(len(e.suggestions) for e in evaluations)
             })
         except:
             refined_response = response
@@ -624,29 +914,18 @@ class EnhancedCAGAgent:
         self,
         current_confidence: float,
         health_score: float,
-        evaluations: List[CriticEvaluation]
+        issue_penalty: float
     ) -> float:
         """Calculate new confidence score"""
         # Weighted combination of factors
         new_confidence = (
             0.3 * current_confidence +  # Preserve some of original
             0.5 * health_score +         # Primary factor: critic health score
-            0.2 * (1 - self._calculate_issue_penalty(evaluations))  # Penalty for issues
+            0.2 * (1 - issue_penalty)  # Penalty for issues
         )
 
         return min(max(new_confidence, 0.0), 1.0)
 
-    def _calculate_issue_penalty(self, evaluations: List[CriticEvaluation]) -> float:
-        """Calculate penalty based on number and severity of issues"""
-        total_issues = sum(len(e.issues) for e in evaluations)
-        critical_issues = sum(
-            len(e.issues) for e in evaluations
-            if e.severity == 'critical'
-        )
-
-        penalty = (total_issues * 0.05) + (critical_issues * 0.15)
-        return min(penalty, 0.5)  # Cap at 50% penalty
-
     async def _verify_consistency(
         self,
         incident: Incident,
@@ -667,21 +946,19 @@ class EnhancedCAGAgent:
         Provide a detailed technical solution with specific steps.
         """
 
-        # Generate alternatives in parallel
-        tasks = [
-            self.llm_service.generate(
-                prompt=prompt_base,
-                max_tokens=800,
-                temperature=0.7  # Higher temperature for diversity
-            )
-            for _ in range(n_samples)
-        ]
-
-        alternative_texts = await asyncio.gather(*tasks, return_exceptions=True)
+        # Sample all alternatives of the one prompt in a single request
+        alternative_texts = await self.llm_service.generate_n(
+            prompt=prompt_base,
+            n=n_samples,
+            max_tokens=self.token_budget.limit('consistency', 800),
+            temperature=0.7  # Higher temperature for diversity
+        )
+        for alt_text in alternative_texts:
+            self.token_budget.observe('consistency', alt_text)
 
         alternatives = []
         for i, alt_text in enumerate(alternative_texts):
-            if not isinstance(alt_text, Exception):
+            if alt_text is not None:
                 alternatives.append({
                     "alternative_id": i + 1,
                     "solution": alt_text,
@@ -705,6 +982,20 @@ class EnhancedCAGAgent:
         if not alternatives:
             return 1.0
 
+        if self.consistency_mode == 'embedding':
+            embedder = await self._get_embedder()
+            if embedder is not None:
+                try:
+                    texts = [_recommendation_text(primary)[:512]]
+                    texts.extend(a['solution'][:512] for a in alternatives)
+                    # Encoding is CPU-bound; keep it off the event loop. The
+                    # embedder returns a normalized ndarray, one row per text
+                    vectors = await asyncio.to_thread(embedder.generate, texts, True)
+                    similarities = vectors[1:] @ vectors[0]
+                    return min(max(float(similarities.mean()), 0.0), 1.0)
+                except Exception as e:
+                    logger.warning(f"Embedding consistency scoring failed, using LLM judge: {e}")
+
         # Use LLM to assess similarity
         alt_texts = "\n\n".join([
             f"Alternative {a['alternative_id']}: {a['solution'][:300]}"
@@ -716,7 +1007,7 @@ class EnhancedCAGAgent:
         Consider if they address the same root cause and suggest similar approaches.
 
         Primary Solution:
-        {json.dumps(primary.get('recommendations', [{}])[0] if primary.get('recommendations') else {}, indent=2)[:500]}
+        {_json_dumps_indented(primary.get('recommendations', [{}])[0] if primary.get('recommendations') else {})[:500]}
 
         Alternative Solutions:
         {alt_texts}
@@ -737,12 +1028,71 @@ class EnhancedCAGAgent:
 
         return min(max(score, 0.0), 1.0)
 
-    async def _merge_consistent_parts(
+    async def _get_embedder(self):
+        """Get the sentence embedder, or None when no real model is available"""
+        if not self._embedder_loaded:
+            async with self._embedder_lock:
+                if not self._embedder_loaded:
+                    try:
+                        from app.utils.embeddings import EmbeddingGenerator
+                        # Loading the model takes seconds; keep it off the event loop
+                        self._embedder = await asyncio.to_thread(EmbeddingGenerator)
+                    except Exception as e:
+                        logger.warning(f"Embedding model unavailable, using LLM consistency judge: {e}")
+                    self._embedder_loaded = True
+
+        # EmbeddingGenerator falls back to pseudo-random vectors without a model,
+        # which would make the similarity meaningless
+        if self._embedder is None or getattr(self._embedder, 'model', None) is None:
+            return None
+        return self._embedder
+
+    def _merge_consistent_parts(
+        self,
+        primary: Dict[str, Any],
+        alternatives: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Merge alternatives into primary without an LLM call
+
+        Numbered steps from the alternative solutions that the primary's first
+        recommendation doesn't already have are appended to its solution steps,
+        in order, up to the validator's step limit.
+        """
+        recommendations = primary.get('recommendations') or []
+        if not recommendations or not isinstance(recommendations[0], dict):
+            return primary
+
+        first = recommendations[0]
+        steps = list(first.get('solution_steps') or [])
+        seen = {_canonical_step(step) for step in steps}
+        added = 0
+
+        for alt in alternatives:
+            for match in _NUMBERED_STEP.finditer(alt['solution']):
+                if len(steps) >= self.validator.max_solution_steps:
+                    break
+                key = _canonical_step(match.group(1))
+                if key not in seen:
+                    seen.add(key)
+                    steps.append(match.group(1))
+                    added += 1
+
+        if not added:
+            return primary
+
+        logger.info(f"Merged {added} steps from alternative solutions")
+        return {
+            **primary,
+            'recommendations': [{**first, 'solution_steps': steps}, *recommendations[1:]]
+        }
+
+    async def _merge_with_llm(
         self,
         primary: Dict[str, Any],
         alternatives: List[Dict[str, Any]]
     ) -> Dict[str, Any]:
-        """Merge consistent parts from alternatives into primary"""
+        """Merge consistent parts from alternatives into primary using the LLM"""
         alt_solutions = "\n".join([
             alt['solution'][:300]
             for alt in alternatives
@@ -753,7 +1103,7 @@ class EnhancedCAGAgent:
         strengthening the primary solution with insights from alternatives.
 
         Primary:
-        {json.dumps(primary, indent=2)[:800]}
+        {_json_dumps_indented(primary)[:800]}
 
         Alternatives:
         {alt_solutions}
@@ -763,12 +1113,13 @@ class EnhancedCAGAgent:
 
         merged_text = await self.llm_service.generate(
             prompt=prompt,
-            max_tokens=1000,
+            max_tokens=self.token_budget.limit('merge', 1000),
             temperature=0.2
         )
+        self.token_budget.observe('merge', merged_text)
 
         try:
-            merged = json.loads(merged_text)
+            merged = _json_loads(merged_text)
             return merged
         except:
             logger.warning("Failed to merge alternatives, returning primary")
@@ -790,21 +1141,33 @@ class EnhancedCAGAgent:
             "timestamp": datetime.now().isoformat()
         }
 
+        # The deque drops its oldest record on append; take it out of the aggregates first
+        if len(self.refinement_history) == self.refinement_history.maxlen:
+            evicted = self.refinement_history[0]
+            self._agg_stages_sum -= evicted['stages']
+            self._agg_improvement_sum -= evicted['improvement']
+            self._agg_consistency_sum -= evicted['consistency_score']
+
         self.refinement_history.append(refinement_record)
+        self._agg_stages_sum += refinement_record['stages']
+        self._agg_improvement_sum += refinement_record['improvement']
+        self._agg_consistency_sum += refinement_record['consistency_score']
 
         # Update critic performance metrics
         for stage in response.stages:
             for evaluation in stage.critic_evaluations:
+                if evaluation.reused:
+                    continue
                 self.critic_performance[evaluation.critic_name].append({
                     "score": evaluation.score,
                     "severity": evaluation.severity,
                     "processing_time": evaluation.processing_time
                 })
-
-        # Trim history
-        max_history = 1000
-        if len(self.refinement_history) > max_history:
-            self.refinement_history = self.refinement_history[-max_history:]
+                agg = self._critic_agg[evaluation.critic_name]
+                agg['n'] += 1
+                agg['score_sum'] += evaluation.score
+                agg['time_sum'] += evaluation.processing_time
+                agg['sev_counts'][evaluation.severity] += 1
 
         logger.info(f"Learning updated: {len(self.refinement_history)} refinements recorded")
 
@@ -813,20 +1176,21 @@ class EnhancedCAGAgent:
         if not self.refinement_history:
             return {"message": "No refinement history available"}
 
-        avg_stages = np.mean([r['stages'] for r in self.refinement_history])
-        avg_improvement = np.mean([r['improvement'] for r in self.refinement_history])
-        avg_consistency = np.mean([r['consistency_score'] for r in self.refinement_history])
+        n = len(self.refinement_history)
+        avg_stages = self._agg_stages_sum / n
+        avg_improvement = self._agg_improvement_sum / n
+        avg_consistency = self._agg_consistency_sum / n
 
         critic_stats = {}
-        for name, evals in self.critic_performance.items():
-            if evals:
+        for name, agg in self._critic_agg.items():
+            if agg['n']:
                 critic_stats[name] = {
-                    "total_evaluations": len(evals),
-                    "average_score": np.mean([e['score'] for e in evals]),
-                    "average_processing_time": np.mean([e['processing_time'] for e in evals]),
+                    "total_evaluations": agg['n'],
+                    "average_score": agg['score_sum'] / agg['n'],
+                    "average_processing_time": agg['time_sum'] / agg['n'],
                     "severity_distribution": {
-                        severity: sum(1 for e in evals if e['severity'] == severity)
-                        for severity in ['low', 'medium', 'high', 'critical']
+                        severity: agg['sev_counts'].get(severity, 0)
+                        for severity in _SEVERITIES
                     }
                 }
 
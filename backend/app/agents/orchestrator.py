@@ -4,12 +4,18 @@ Manages the flow between RAG, CAG, and Predictive agents
 """
 
 import asyncio
-from typing import Dict, Any, List, Optional
+import sys
+import time
+from collections import deque
+from itertools import islice
+from types import MappingProxyType
+from typing import Dict, Any, List, Mapping, Optional
 from datetime import datetime
 import logging
 from dataclasses import dataclass
 from enum import Enum
 import json
+import numpy as np
 
 from app.agents.rag_agent import RAGAgent, RAGResponse
 from app.agents.cag_agent import CAGAgent, CAGResponse
@@ -18,6 +24,35 @@ from app.models.incident import Incident, FeedbackRequest
 
 logger = logging.getLogger(__name__)
 
+# Shared read-only metadata for events that carry none
+_EMPTY_META: Mapping[str, Any] = MappingProxyType({})
+
+def _json_default(obj: Any) -> Any:
+    """Serialize the values event payloads hold that the encoder doesn't know"""
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+# orjson encodes event payloads several times faster than stdlib json and
+# handles datetimes natively; fall back to json when unavailable
+try:
+    import orjson
+
+    _loads = orjson.loads
+
+    def _dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, default=_json_default)
+except ImportError:
+    _loads = json.loads
+
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj, default=_json_default).encode()
+
+# Exponential moving average factor for the running confidence metric
+_CONFIDENCE_EMA_ALPHA = 0.1
+
 class ProcessingStage(Enum):
     """Stages of incident processing"""
     INITIALIZATION = "initialization"
@@ -29,19 +64,28 @@ class ProcessingStage(Enum):
     FINALIZATION = "finalization"
     COMPLETED = "completed"
 
-@dataclass
+# Stage -> wire value, so serialization skips the Enum .value descriptor
+_STAGE_VALUES: Dict[ProcessingStage, str] = {
+    stage: sys.intern(stage.value) for stage in ProcessingStage
+}
+
+@dataclass(slots=True)
 class ProcessingEvent:
     """Event during processing for real-time updates"""
     stage: ProcessingStage
     message: str
     progress: float  # 0.0 to 1.0
     timestamp: datetime
-    metadata: Dict[str, Any]
+    metadata: Mapping[str, Any]
 
 class AgentOrchestrator:
     """
     Orchestrates multiple agents to process incidents
     Manages coordination, communication, and workflow
+    
+    Almost all of the work here is awaiting other agents, so it benefits
+    from running on uvloop. uvicorn[standard] ships uvloop and selects it
+    automatically, and get_system_status reports which loop is in use.
     """
     
     def __init__(
@@ -55,6 +99,12 @@ class AgentOrchestrator:
         self.cag_agent = cag_agent
         self.predictive_agent = predictive_agent
         
+        # Bound once for the per-incident path; replacing an agent's method
+        # after construction is not picked up
+        self._rag_process = rag_agent.process if rag_agent else None
+        self._cag_refine = cag_agent.refine if cag_agent else None
+        self._predict = predictive_agent.predict if predictive_agent else None
+        
         # Configuration
         self.config = config or {}
         self.enable_cag = self.config.get('enable_cag', True)
@@ -63,16 +113,26 @@ class AgentOrchestrator:
         self.parallel_processing = self.config.get('parallel_processing', True)
         
         # Event tracking
-        self.events_queue = asyncio.Queue()
-        self.processing_history = []
+        # Events are stored already serialized to JSON bytes. Bounded so unread
+        # telemetry never grows without limit; oldest events drop first
+        self._events: deque = deque(maxlen=self.config.get('event_buffer', 1024))
+        self.processing_history: deque = deque(maxlen=self.config.get('history_max', 1000))
+        
+        # Low-rating feedback is coalesced into one debounced model update
+        self.model_update_debounce = self.config.get('model_update_debounce', 5.0)
+        self._pending_feedback: List[FeedbackRequest] = []
+        self._update_handle: Optional[asyncio.TimerHandle] = None
+        self._update_task: Optional[asyncio.Task] = None
         
         # Metrics
         self.total_processed = 0
         self.total_cag_applied = 0
         self.average_confidence = 0.0
+        # Confidences not yet folded into average_confidence; see _flush_metrics
+        self._pending_confidences: List[float] = []
         
         logger.info("Agent Orchestrator initialized with %s agents", 
-                   sum([1 for a in [rag_agent, cag_agent, predictive_agent] if a]))
+                   sum(1 for a in (rag_agent, cag_agent, predictive_agent) if a is not None))
     
     async def process_incident(
         self,
@@ -82,107 +142,117 @@ class AgentOrchestrator:
         """
         Main orchestration method - coordinates all agents
         """
-        start_time = datetime.now()
+        orchestrated_response = await self._run_pipeline(incident, stream_events)
+        self._update_metrics(orchestrated_response)
+        return orchestrated_response
+    
+    async def process_batch(
+        self,
+        incidents: List[Incident],
+        max_concurrency: int = 32
+    ) -> List[Any]:
+        """
+        Process several incidents concurrently, at most max_concurrency at a time
+        
+        Returns one entry per incident, in order: the orchestrated response,
+        or the exception that incident failed with. Metrics are recorded once
+        for the whole batch.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def _process_one(incident: Incident) -> Dict[str, Any]:
+            async with semaphore:
+                return await self._run_pipeline(incident, stream_events=False)
+        
+        results = await asyncio.gather(
+            *(_process_one(incident) for incident in incidents),
+            return_exceptions=True
+        )
+        
+        self._pending_confidences.extend(
+            r["confidence"] for r in results if not isinstance(r, BaseException)
+        )
+        return results
+    
+    async def _run_pipeline(
+        self,
+        incident: Incident,
+        stream_events: bool
+    ) -> Dict[str, Any]:
+        """
+        Run every processing stage for one incident, without touching the
+        confidence metric
+        """
+        # Wall-clock timestamps are sampled once per stage; durations use perf_counter
+        start_perf = time.perf_counter()
+        stage_now = datetime.now()
         self.total_processed += 1
+        # Events are buffered per stage and flushed before each long await;
+        # without streaming they are never built at all
+        pending: Optional[List[ProcessingEvent]] = [] if stream_events else None
         
         try:
             # Initialize processing
-            await self._emit_event(ProcessingEvent(
-                stage=ProcessingStage.INITIALIZATION,
-                message="Starting incident processing",
-                progress=0.0,
-                timestamp=datetime.now(),
-                metadata={"incident_id": incident.id}
-            ))
+            if pending is not None:
+                pending.append(ProcessingEvent(
+                    stage=ProcessingStage.INITIALIZATION,
+                    message="Starting incident processing",
+                    progress=0.0,
+                    timestamp=stage_now,
+                    metadata={"incident_id": incident.id}
+                ))
             
             # Stage 1: RAG Processing
-            logger.info(f"Stage 1: RAG processing for incident {incident.id}")
-            await self._emit_event(ProcessingEvent(
-                stage=ProcessingStage.RAG_RETRIEVAL,
-                message="Retrieving similar incidents from knowledge base",
-                progress=0.2,
-                timestamp=datetime.now(),
-                metadata={"top_k": self.rag_agent.top_k}
-            ))
-            
-            rag_response = await self.rag_agent.process(incident)
-            
-            await self._emit_event(ProcessingEvent(
-                stage=ProcessingStage.RAG_GENERATION,
-                message=f"Generated recommendations with {len(rag_response.sources)} sources",
-                progress=0.4,
-                timestamp=datetime.now(),
-                metadata={
-                    "sources_found": len(rag_response.sources),
-                    "initial_confidence": rag_response.confidence
-                }
-            ))
-            
-            # Stage 2: Predictive Analytics (can run in parallel)
-            predictions = None
-            if self.enable_prediction:
-                logger.info("Stage 2: Predictive analytics")
-                await self._emit_event(ProcessingEvent(
-                    stage=ProcessingStage.PREDICTION,
-                    message="Analyzing incident patterns and predicting metrics",
-                    progress=0.5,
-                    timestamp=datetime.now(),
-                    metadata={}
+            logger.info("Stage 1: RAG processing for incident %s", incident.id)
+            if pending is not None:
+                pending.append(ProcessingEvent(
+                    stage=ProcessingStage.RAG_RETRIEVAL,
+                    message="Retrieving similar incidents from knowledge base",
+                    progress=0.2,
+                    timestamp=stage_now,
+                    metadata={"top_k": self.rag_agent.top_k}
                 ))
-                
-                if self.parallel_processing:
-                    # Run prediction in parallel with CAG
-                    prediction_task = asyncio.create_task(
-                        self.predictive_agent.predict(incident)
-                    )
-                else:
-                    predictions = await self.predictive_agent.predict(incident)
             
-            # Stage 3: CAG Refinement (if needed)
-            final_response = rag_response
-            cag_applied = False
+            if pending:
+                self._emit_many(pending)
+            rag_response = await self._rag_process(incident)
+            stage_now = datetime.now()
             
-            if self.enable_cag and rag_response.confidence < self.cag_threshold:
-                logger.info(f"Stage 3: CAG refinement (confidence {rag_response.confidence:.2f} < {self.cag_threshold})")
-                
-                await self._emit_event(ProcessingEvent(
-                    stage=ProcessingStage.CAG_EVALUATION,
-                    message=f"Response confidence low ({rag_response.confidence:.2f}), applying CAG",
-                    progress=0.6,
-                    timestamp=datetime.now(),
-                    metadata={"reason": "low_confidence"}
-                ))
-                
-                cag_response = await self.cag_agent.refine(incident, rag_response)
-                
-                await self._emit_event(ProcessingEvent(
-                    stage=ProcessingStage.CAG_REFINEMENT,
-                    message=f"Refined response through {cag_response.total_iterations} iterations",
-                    progress=0.8,
-                    timestamp=datetime.now(),
+            if pending is not None:
+                pending.append(ProcessingEvent(
+                    stage=ProcessingStage.RAG_GENERATION,
+                    message=f"Generated recommendations with {len(rag_response.sources)} sources",
+                    progress=0.4,
+                    timestamp=stage_now,
                     metadata={
-                        "iterations": cag_response.total_iterations,
-                        "improvement": f"{cag_response.improvement_percentage:.1f}%"
+                        "sources_found": len(rag_response.sources),
+                        "initial_confidence": rag_response.confidence
                     }
                 ))
-                
+            
+            # Stages 2 & 3: Predictive analytics and CAG refinement (if needed)
+            cag_response, predictions = await self._run_refinement_and_prediction(
+                incident, rag_response, pending
+            )
+            
+            final_response = rag_response
+            cag_applied = False
+            if cag_response is not None:
                 # Convert CAG response to RAG-like format for consistency
                 final_response = self._merge_responses(rag_response, cag_response)
                 cag_applied = True
                 self.total_cag_applied += 1
             
-            # Wait for prediction if it was running in parallel
-            if self.enable_prediction and self.parallel_processing and not predictions:
-                predictions = await prediction_task
-            
             # Stage 4: Finalize response
-            await self._emit_event(ProcessingEvent(
-                stage=ProcessingStage.FINALIZATION,
-                message="Preparing final response",
-                progress=0.9,
-                timestamp=datetime.now(),
-                metadata={}
-            ))
+            stage_now = datetime.now()
+            if pending is not None:
+                pending.append(ProcessingEvent(
+                    stage=ProcessingStage.FINALIZATION,
+                    message="Preparing final response",
+                    progress=0.9,
+                    timestamp=stage_now,
+                    metadata=_EMPTY_META
+                ))
             
             # Combine all results
             orchestrated_response = self._create_final_response(
@@ -190,38 +260,126 @@ class AgentOrchestrator:
                 rag_response=final_response,
                 predictions=predictions,
                 cag_applied=cag_applied,
-                processing_time=(datetime.now() - start_time).total_seconds()
+                processing_time=time.perf_counter() - start_perf
             )
             
-            # Update metrics
-            self._update_metrics(orchestrated_response)
-            
             # Final event
-            await self._emit_event(ProcessingEvent(
-                stage=ProcessingStage.COMPLETED,
-                message="Processing completed successfully",
-                progress=1.0,
-                timestamp=datetime.now(),
-                metadata={
-                    "total_time": orchestrated_response["processing_time"],
-                    "confidence": orchestrated_response["confidence"]
-                }
-            ))
+            if pending is not None:
+                pending.append(ProcessingEvent(
+                    stage=ProcessingStage.COMPLETED,
+                    message="Processing completed successfully",
+                    progress=1.0,
+                    timestamp=stage_now,
+                    metadata={
+                        "total_time": orchestrated_response["processing_time"],
+                        "confidence": orchestrated_response["confidence"]
+                    }
+                ))
+            if pending:
+                self._emit_many(pending)
             
-            logger.info(f"Orchestration completed in {orchestrated_response['processing_time']:.2f}s")
+            logger.info("Orchestration completed in %.2fs", orchestrated_response["processing_time"])
             return orchestrated_response
             
         except Exception as e:
-            logger.error(f"Orchestration failed: {e}")
-            await self._emit_event(ProcessingEvent(
-                stage=ProcessingStage.COMPLETED,
-                message=f"Processing failed: {str(e)}",
-                progress=1.0,
-                timestamp=datetime.now(),
-                metadata={"error": str(e)}
-            ))
+            logger.error("Orchestration failed: %s", e)
+            stage_now = datetime.now()
+            if pending is not None:
+                pending.append(ProcessingEvent(
+                    stage=ProcessingStage.COMPLETED,
+                    message=f"Processing failed: {str(e)}",
+                    progress=1.0,
+                    timestamp=stage_now,
+                    metadata={"error": str(e)}
+                ))
+            if pending:
+                self._emit_many(pending)
             raise
     
+    async def _run_refinement_and_prediction(
+        self,
+        incident: Incident,
+        rag_response: RAGResponse,
+        pending: Optional[List[ProcessingEvent]]
+    ):
+        """
+        Run CAG refinement and prediction, overlapping them when
+        parallel_processing is enabled
+        
+        Returns (cag_response, predictions); either is None when its stage
+        was skipped. Stage events are appended to `pending` (None when not
+        streaming), which is flushed before the agents are awaited. A failure
+        in either stage is re-raised once both have finished.
+        """
+        run_cag = self.enable_cag and rag_response.confidence < self.cag_threshold
+        stages = []
+        coros = []
+        stage_now = datetime.now()
+        
+        if self.enable_prediction:
+            logger.info("Stage 2: Predictive analytics")
+            if pending is not None:
+                pending.append(ProcessingEvent(
+                    stage=ProcessingStage.PREDICTION,
+                    message="Analyzing incident patterns and predicting metrics",
+                    progress=0.5,
+                    timestamp=stage_now,
+                    metadata=_EMPTY_META
+                ))
+            stages.append(ProcessingStage.PREDICTION)
+            coros.append(self._predict(incident))
+        
+        if run_cag:
+            logger.info("Stage 3: CAG refinement (confidence %.2f < %s)", rag_response.confidence, self.cag_threshold)
+            if pending is not None:
+                pending.append(ProcessingEvent(
+                    stage=ProcessingStage.CAG_EVALUATION,
+                    message=f"Response confidence low ({rag_response.confidence:.2f}), applying CAG",
+                    progress=0.6,
+                    timestamp=stage_now,
+                    metadata={"reason": "low_confidence"}
+                ))
+            stages.append(ProcessingStage.CAG_REFINEMENT)
+            coros.append(self._cag_refine(incident, rag_response))
+        
+        if pending:
+            self._emit_many(pending)
+        if self.parallel_processing:
+            results = await asyncio.gather(*coros, return_exceptions=True)
+        else:
+            results = []
+            for coro in coros:
+                try:
+                    results.append(await coro)
+                except Exception as e:
+                    results.append(e)
+        
+        cag_response = None
+        predictions = None
+        for stage, result in zip(stages, results):
+            if isinstance(result, BaseException):
+                raise result
+            if stage is ProcessingStage.PREDICTION:
+                predictions = result
+            else:
+                cag_response = result
+        
+        if cag_response is not None:
+            stage_now = datetime.now()
+            if pending is not None:
+                pending.append(ProcessingEvent(
+                    stage=ProcessingStage.CAG_REFINEMENT,
+                    message=f"Refined response through {cag_response.total_iterations} iterations",
+                    progress=0.8,
+                    timestamp=stage_now,
+                    metadata={
+                        "iterations": cag_response.total_iterations,
+                        "improvement": f"{cag_response.improvement_percentage:.1f}%"
+                    }
+                ))
+        
+        return cag_response, predictions
+    
     async def process_feedback(self, feedback: FeedbackRequest):
         """
         Process user feedback and trigger learning
@@ -240,25 +398,26 @@ class AgentOrchestrator:
         # Trigger retraining if rating is low
         if feedback.rating <= 2:
             logger.info("Low rating received, scheduling model update")
-            asyncio.create_task(self._trigger_model_update(feedback))
+            self._pending_feedback.append(feedback)
+            self._schedule_model_update()
         
         # Update knowledge base if feedback is positive
         if feedback.rating >= 4 and feedback.helpful:
             logger.info("Positive feedback received, updating knowledge base")
             # This would update the vector store with successful resolution
     
-    async def get_events(self) -> List[Dict[str, Any]]:
-        """
-        Get queued events for real-time updates
-        """
-        events = []
-        while not self.events_queue.empty():
-            try:
-                event = await asyncio.wait_for(self.events_queue.get(), timeout=0.1)
-                events.append(self._event_to_dict(event))
-            except asyncio.TimeoutError:
-                break
-        return events
+    async def get_events(self) -> List[bytes]:
+        """
+        Get queued events for real-time updates, as JSON-encoded bytes
+        """
+        events, self._events = self._events, deque(maxlen=self._events.maxlen)
+        return list(events)
+    
+    async def get_events_decoded(self) -> List[Dict[str, Any]]:
+        """
+        Get queued events as dictionaries, for callers that need the fields
+        """
+        return [_loads(event) for event in await self.get_events()]
     
     async def trigger_retraining(self):
         """
@@ -275,13 +434,12 @@ class AgentOrchestrator:
         training_data = self._prepare_training_data()
         
         # Update each agent's models
-        tasks = []
-        if hasattr(self.predictive_agent, 'update_models'):
-            tasks.append(self.predictive_agent.update_models(training_data))
+        if not hasattr(self.predictive_agent, 'update_models'):
+            return
         
-        if tasks:
-            await asyncio.gather(*tasks)
-            logger.info("Model retraining completed")
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(self.predictive_agent.update_models(training_data))
+        logger.info("Model retraining completed")
     
     def _merge_responses(
         self,
@@ -297,9 +455,7 @@ class AgentOrchestrator:
             confidence=cag_response.final_confidence,
             sources=rag_response.sources,  # Keep original sources
             retrieval_time=rag_response.retrieval_time,
-            generation_time=rag_response.generation_time + sum(
-                it.confidence_after for it in cag_response.iterations
-            ) * 0.5,  # Approximate additional time
+            generation_time=rag_response.generation_time + self._refinement_time(cag_response),
             total_time=rag_response.total_time,
             metadata={
                 **rag_response.metadata,
@@ -308,6 +464,17 @@ class AgentOrchestrator:
             }
         )
     
+    @staticmethod
+    def _refinement_time(cag_response: CAGResponse) -> float:
+        """
+        Time spent in CAG refinement - the measured value when the agent
+        reports one, otherwise an estimate of 0.5s per iteration
+        """
+        measured = cag_response.metadata.get("processing_time")
+        if measured is not None:
+            return measured
+        return cag_response.total_iterations * 0.5
+    
     def _create_final_response(
         self,
         incident: Incident,
@@ -319,7 +486,9 @@ class AgentOrchestrator:
         """
         Create the final orchestrated response
         """
-        response = {
+        # Without predictions every field falls back to its default
+        p = predictions or {}
+        return {
             "incident_id": incident.id,
             "recommendations": rag_response.recommendations,
             "confidence": rag_response.confidence,
@@ -330,85 +499,130 @@ class AgentOrchestrator:
                 "rag_retrieval": rag_response.retrieval_time,
                 "rag_generation": rag_response.generation_time,
                 "cag_refinement": rag_response.metadata.get("cag_iterations", 0) * 0.5 if cag_applied else 0
-            }
+            },
+            "severity": p.get("severity", "medium"),
+            "severity_confidence": p.get("severity_confidence", 0.5) if predictions else None,
+            "estimated_resolution_time": p.get("resolution_time", 60),
+            "assigned_team": p.get("team", "Support") if predictions else "L1-Support",
+            "risk_factors": p.get("risk_factors", []),
+            "predictive_recommendations": p.get("recommendations", [])
         }
-        
-        # Add predictions if available
-        if predictions:
-            response.update({
-                "severity": predictions.get("severity", "medium"),
-                "severity_confidence": predictions.get("severity_confidence", 0.5),
-                "estimated_resolution_time": predictions.get("resolution_time", 60),
-                "assigned_team": predictions.get("team", "Support"),
-                "risk_factors": predictions.get("risk_factors", []),
-                "predictive_recommendations": predictions.get("recommendations", [])
-            })
-        else:
-            # Default values if prediction is disabled
-            response.update({
-                "severity": "medium",
-                "estimated_resolution_time": 60,
-                "assigned_team": "L1-Support"
-            })
-        
-        return response
     
-    async def _emit_event(self, event: ProcessingEvent):
+    def _emit_many(self, events: List[ProcessingEvent]):
         """
-        Emit a processing event for real-time updates
+        Emit buffered processing events for real-time updates in one step
+        and clear the buffer
         """
-        await self.events_queue.put(event)
-        logger.debug(f"Event emitted: {event.stage.value} - {event.message}")
+        self._events.extend(map(self._event_to_json, events))
+        if logger.isEnabledFor(logging.DEBUG):
+            for event in events:
+                logger.debug("Event emitted: %s - %s", _STAGE_VALUES[event.stage], event.message)
+        events.clear()
     
-    def _event_to_dict(self, event: ProcessingEvent) -> Dict[str, Any]:
+    def _event_to_json(self, event: ProcessingEvent) -> bytes:
         """
-        Convert event to dictionary for JSON serialization
+        Serialize an event to JSON bytes; this happens once, when it is emitted
         """
-        return {
-            "stage": event.stage.value,
+        return _dumps({
+            "stage": _STAGE_VALUES[event.stage],
             "message": event.message,
             "progress": event.progress,
-            "timestamp": event.timestamp.isoformat(),
+            "timestamp": event.timestamp,
             "metadata": event.metadata
-        }
+        })
     
     def _update_metrics(self, response: Dict[str, Any]):
         """
         Update orchestrator metrics
+        
+        The confidence is only recorded here; it is folded into the running
+        average when metrics are read, or once enough have accumulated.
+        """
+        self._pending_confidences.append(response["confidence"])
+        if len(self._pending_confidences) >= 1024:
+            self._flush_metrics()
+    
+    def _flush_metrics(self):
+        """
+        Fold recorded confidences into the running average, in arrival order
         """
-        # Update running average confidence
-        alpha = 0.1  # Exponential moving average factor
+        pending, self._pending_confidences = self._pending_confidences, []
+        if pending:
+            self._update_metrics_batch(np.asarray(pending, dtype=np.float64))
+    
+    def _update_metrics_batch(self, confidences: np.ndarray):
+        """
+        Fold a batch of confidences into the running average in one pass
+        
+        Closed form of applying the per-incident EMA step once per value, in order:
+        ema_n = (1-a)^n * ema_0 + a * sum((1-a)^(n-i-1) * x_i)
+        """
+        n = len(confidences)
+        if n == 0:
+            return
+        decay = 1 - _CONFIDENCE_EMA_ALPHA
+        weights = decay ** np.arange(n - 1, -1, -1)
         self.average_confidence = (
-            alpha * response["confidence"] +
-            (1 - alpha) * self.average_confidence
+            decay ** n * self.average_confidence +
+            _CONFIDENCE_EMA_ALPHA * float(np.dot(weights, confidences))
         )
     
-    async def _trigger_model_update(self, feedback: FeedbackRequest):
+    def _schedule_model_update(self):
+        """
+        (Re)start the debounce timer; the update runs once feedback has been
+        quiet for model_update_debounce seconds
+        """
+        if self._update_handle is not None:
+            self._update_handle.cancel()
+        loop = asyncio.get_running_loop()
+        self._update_handle = loop.call_later(self.model_update_debounce, self._start_model_update)
+    
+    def _start_model_update(self):
         """
-        Trigger model update based on feedback
+        Timer callback - run the pending update as a task
         """
-        await asyncio.sleep(5)  # Debounce
-        logger.info(f"Model update triggered by feedback on {feedback.incident_id}")
+        self._update_handle = None
+        self._update_task = asyncio.create_task(self._flush_updates())
+    
+    async def _flush_updates(self):
+        """
+        Trigger a single model update for all feedback received since the last one
+        """
+        feedback, self._pending_feedback = self._pending_feedback, []
+        if not feedback:
+            return
+        logger.info(
+            "Model update triggered by feedback on %d incidents: %s",
+            len(feedback), ", ".join(f.incident_id for f in feedback)
+        )
         # In production, this would queue a retraining job
     
-    def _prepare_training_data(self) -> List[Dict[str, Any]]:
+    def _prepare_training_data(self) -> Dict[str, np.ndarray]:
         """
         Prepare training data from processing history
+        
+        Columnar layout - parallel arrays indexed by sample:
+        incident_id (object), success (bool), confidence (float32)
         """
-        training_data = []
-        for record in self.processing_history[-100:]:  # Last 100 records
-            if "rating" in record and record["rating"] >= 4:
-                training_data.append({
-                    "incident_id": record["incident_id"],
-                    "success": True,
-                    "confidence": record.get("confidence", 0.8)
-                })
-        return training_data
+        incident_ids = []
+        confidences = []
+        history = self.processing_history
+        for record in islice(history, max(len(history) - 100, 0), None):  # Last 100 records
+            if record.get("rating", 0) >= 4:
+                incident_ids.append(record["incident_id"])
+                confidences.append(record.get("confidence", 0.8))
+        return {
+            "incident_id": np.asarray(incident_ids, dtype=object),
+            "success": np.ones(len(incident_ids), dtype=bool),
+            "confidence": np.asarray(confidences, dtype=np.float32)
+        }
     
     async def get_system_status(self) -> Dict[str, Any]:
         """
         Get current system status and metrics
         """
+        loop = asyncio.get_running_loop()
+        self._flush_metrics()
         return {
             "orchestrator": {
                 "total_processed": self.total_processed,
@@ -427,7 +641,8 @@ class AgentOrchestrator:
                 "parallel_processing": self.parallel_processing
             },
             "performance": {
-                "events_queued": self.events_queue.qsize(),
+                "event_loop": f"{type(loop).__module__}.{type(loop).__qualname__}",
+                "events_queued": len(self._events),
                 "history_size": len(self.processing_history)
             }
         }
\ No newline at end of file
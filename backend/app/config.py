@@ -62,6 +62,10 @@ class Settings(BaseSettings):
     CAG_MAX_ITERATIONS: int = 3
     CAG_CONFIDENCE_TARGET: float = 0.85
     CAG_FEEDBACK_WEIGHT: float = 0.3
+    CAG_SEMANTIC_CACHE_ENABLED: bool = False
+    CAG_SEMANTIC_CACHE_THRESHOLD: float = 0.87
+    CAG_SEMANTIC_CACHE_TTL: int = 3600
+    CAG_SEMANTIC_CACHE_SIZE: int = 10000
     
     # Predictive Analytics
     PREDICTION_ENABLED: bool = True
@@ -87,7 +87,12 @@ async def lifespan(app: FastAPI):
         # FIXED: Create dummy agents when classes aren't available
         try:
             from app.agents.cag_agent import CAGAgent
-            cag_agent = CAGAgent(llm_service, rag_agent)
+            cag_agent = CAGAgent(llm_service, rag_agent, config={
+                'enable_semantic_cache': settings.CAG_SEMANTIC_CACHE_ENABLED,
+                'semantic_cache_threshold': settings.CAG_SEMANTIC_CACHE_THRESHOLD,
+                'semantic_cache_ttl': settings.CAG_SEMANTIC_CACHE_TTL,
+                'semantic_cache_size': settings.CAG_SEMANTIC_CACHE_SIZE
+            })
         except:
             class DummyCAGAgent:
                 async def refine(self, incident, response):
@@ -323,14 +328,15 @@ async def websocket_endpoint(websocket: WebSocket):
                 "timestamp": datetime.utcnow().isoformat()
             })
             
-            # Check for agent events
+            # Check for agent events - they arrive already JSON-encoded, so
+            # splice them into the message instead of decoding and re-encoding
             agent_events = await orchestrator.get_events()
             if agent_events:
-                await websocket.send_json({
-                    "type": "agent_event",
-                    "data": agent_events,
-                    "timestamp": datetime.utcnow().isoformat()
-                })
+                await websocket.send_text(
+                    '{"type": "agent_event", "data": ['
+                    + b", ".join(agent_events).decode()
+                    + '], "timestamp": "' + datetime.utcnow().isoformat() + '"}'
+                )
             
             await asyncio.sleep(1)  # Send updates every second
             
@@ -0,0 +1,264 @@
+"""
+LLM response caching
+Semantic cache that sits in front of LLMService.generate
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+import numpy as np
+import logging
+
+from app.services.llm_service import LLMService, is_cacheable_response
+
+logger = logging.getLogger(__name__)
+
+
+class _EmbeddingBucket:
+    """
+    Prompt embeddings for a single call site, stored as rows of one matrix
+    so a lookup is a single matrix-vector product
+    """
+
+    def __init__(self, dim: int, initial_capacity: int = 64):
+        self.matrix = np.zeros((initial_capacity, dim), dtype=np.float32)
+        self.size = 0
+        self.free_rows = []
+
+    def add(self, embedding: np.ndarray) -> int:
+        """Store an embedding and return its row"""
+        if self.free_rows:
+            row = self.free_rows.pop()
+        else:
+            if self.size == len(self.matrix):
+                grown = np.zeros((len(self.matrix) * 2, self.matrix.shape[1]), dtype=np.float32)
+                grown[:self.size] = self.matrix[:self.size]
+                self.matrix = grown
+            row = self.size
+            self.size += 1
+
+        self.matrix[row] = embedding
+        return row
+
+    def remove(self, row: int):
+        """Free a row; a zero vector never clears the similarity threshold"""
+        self.matrix[row] = 0.0
+        self.free_rows.append(row)
+
+    def nearest(self, embedding: np.ndarray) -> Tuple[int, float]:
+        """Return (row, cosine similarity) of the closest stored embedding"""
+        if self.size == 0:
+            return -1, 0.0
+        similarities = self.matrix[:self.size] @ embedding
+        row = int(np.argmax(similarities))
+        return row, float(similarities[row])
+
+
+class SemanticLLMCache:
+    """
+    Drop-in wrapper for LLMService that reuses completions of semantically
+    equivalent prompts.
+
+    Prompts are embedded with the sentence-transformer model and compared by
+    cosine similarity. Entries are bucketed by call site (the first line of
+    the prompt, which is the fixed instruction of each template) so that
+    different templates never answer each other, and are evicted LRU once
+    `max_size` entries are held or after `ttl` seconds.
+    """
+
+    def __init__(
+        self,
+        llm_service: LLMService,
+        embedder=None,
+        threshold: float = 0.87,
+        ttl: int = 3600,
+        max_size: int = 10000,
+        batch_window: float = 0.005
+    ):
+        self.llm_service = llm_service
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_size = max_size
+        self.batch_window = batch_window
+
+        if embedder is None:
+            from app.utils.embeddings import EmbeddingGenerator
+            embedder = EmbeddingGenerator()
+        self.embedder = embedder
+
+        # EmbeddingGenerator falls back to pseudo-random vectors seeded from the
+        # text prefix when the model can't load - those would make every prompt
+        # of a template look identical, so caching is disabled instead
+        self.enabled = getattr(embedder, 'model', None) is not None
+        if not self.enabled:
+            logger.warning("Embedding model unavailable, semantic LLM cache disabled")
+        else:
+            # Pay the first-encode warmup cost now rather than on the first request
+            self.embedder.generate("warmup", normalize=True)
+
+        # Prompts waiting for the next batched encode
+        self._pending = []
+        self._flush_task = None
+
+        self._buckets: Dict[str, _EmbeddingBucket] = {}
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[str, float]]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+        logger.info(f"SemanticLLMCache initialized with threshold={threshold}, max_size={max_size}")
+
+    def __getattr__(self, name):
+        # Everything other than generate() goes straight to the wrapped service
+        return getattr(self.llm_service, name)
+
+    async def generate(
+        self,
+        prompt: str,
+        max_tokens: int = 1024,
+        temperature: float = 0.7,
+        top_p: float = 0.9,
+        stream: bool = False,
+        response_format: Optional[Any] = None
+    ) -> str:
+        """
+        Generate text, answering from the cache when a similar prompt was seen
+        """
+        if not self.enabled or stream:
+            return await self.llm_service.generate(
+                prompt=prompt,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                top_p=top_p,
+                stream=stream,
+                response_format=response_format
+            )
+
+        bucket_key = self._bucket_key(prompt)
+        try:
+            embedding = await self._embed(prompt)
+        except Exception as e:
+            logger.warning(f"Prompt embedding failed, bypassing semantic cache: {e}")
+            return await self.llm_service.generate(
+                prompt=prompt,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                top_p=top_p,
+                stream=stream,
+                response_format=response_format
+            )
+
+        cached = self._lookup(bucket_key, embedding)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        response = await self.llm_service.generate(
+            prompt=prompt,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            top_p=top_p,
+            stream=stream,
+            response_format=response_format
+        )
+        # A failed call's canned fallback must not be served to similar prompts
+        if is_cacheable_response(response):
+            self._store(bucket_key, embedding, response)
+        return response
+
+    def _bucket_key(self, prompt: str) -> str:
+        """Use the template's leading instruction line as the call-site key"""
+        for line in prompt.splitlines():
+            line = line.strip()
+            if line:
+                return line
+        return ""
+
+    async def _embed(self, prompt: str) -> np.ndarray:
+        """
+        Embed a prompt as a normalized float32 vector.
+
+        Encoding is CPU-bound, so it runs in a worker thread. Prompts that
+        arrive within batch_window seconds of each other (e.g. from concurrent
+        refinements) are encoded together in one model call.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((prompt, future))
+        if len(self._pending) == 1:
+            self._flush_task = asyncio.create_task(self._flush_embeddings())
+        return await future
+
+    async def _flush_embeddings(self):
+        """Encode every pending prompt in a single batch"""
+        await asyncio.sleep(self.batch_window)
+        batch, self._pending = self._pending, []
+        prompts = [prompt for prompt, _ in batch]
+
+        try:
+            embeddings = await asyncio.to_thread(self.embedder.generate, prompts, True)
+            embeddings = np.asarray(embeddings, dtype=np.float32).reshape(len(prompts), -1)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), embedding in zip(batch, embeddings):
+            if not future.done():
+                future.set_result(embedding)
+
+    def _lookup(self, bucket_key: str, embedding: np.ndarray) -> Optional[str]:
+        """Find a live cached response within the similarity threshold"""
+        bucket = self._buckets.get(bucket_key)
+        if bucket is None:
+            return None
+
+        row, similarity = bucket.nearest(embedding)
+        if similarity < self.threshold:
+            return None
+
+        key = (bucket_key, row)
+        response, expires_at = self._entries[key]
+        if time.monotonic() > expires_at:
+            self._evict(key)
+            return None
+
+        self._entries.move_to_end(key)
+        return response
+
+    def _store(self, bucket_key: str, embedding: np.ndarray, response: str):
+        """Insert a response, evicting the least recently used entries"""
+        bucket = self._buckets.get(bucket_key)
+        if bucket is None:
+            bucket = self._buckets[bucket_key] = _EmbeddingBucket(len(embedding))
+
+        row = bucket.add(embedding)
+        self._entries[(bucket_key, row)] = (response, time.monotonic() + self.ttl)
+
+        while len(self._entries) > self.max_size:
+            self._evict(next(iter(self._entries)))
+
+    def _evict(self, key: Tuple[str, int]):
+        """Drop a single entry"""
+        bucket_key, row = key
+        del self._entries[key]
+        self._buckets[bucket_key].remove(row)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "buckets": len(self._buckets),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total > 0 else 0.0
+        }
+
+    def clear(self):
+        """Drop all cached responses"""
+        self._buckets.clear()
+        self._entries.clear()
@@ -12,6 +12,21 @@ from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+
+class FallbackResponse(str):
+    """
+    Canned text that LLMService.generate returns when the LLM call failed.
+    
+    It reads like any other completion, but callers that cache completions
+    should check isinstance(response, FallbackResponse) and not store it.
+    """
+
+
+def is_cacheable_response(response: Optional[str]) -> bool:
+    """Whether a generate() result is a real, non-empty completion worth caching"""
+    return bool(response) and not isinstance(response, FallbackResponse)
+
+
 class LLMService:
     """
     Service for managing LLM interactions with Ollama
@@ -41,10 +56,14 @@ class LLMService:
         max_tokens: int = 1024,
         temperature: float = 0.7,
         top_p: float = 0.9,
-        stream: bool = False
+        stream: bool = False,
+        response_format: Optional[Any] = None
     ) -> str:
         """
         Generate text using Ollama
+
+        response_format is forwarded as Ollama's `format` option: "json" to
+        force a JSON reply, or a JSON schema dict for structured output.
         """
         await self._ensure_session()
         
@@ -60,6 +79,8 @@ class LLMService:
                 },
                 "stream": stream
             }
+            if response_format is not None:
+                payload["format"] = response_format
             
             # Make request to Ollama
             url = f"{self.host}/api/generate"
@@ -98,6 +119,35 @@ class LLMService:
             logger.error(f"Failed to generate text: {e}")
             return self._get_fallback_response(prompt)
     
+    async def generate_n(
+        self,
+        prompt: str,
+        n: int = 1,
+        max_tokens: int = 1024,
+        temperature: float = 0.7,
+        top_p: float = 0.9
+    ) -> List[Optional[str]]:
+        """
+        Sample n completions of the same prompt
+
+        Ollama's generate endpoint has no `n` option, so the samples are sent
+        as concurrent requests (served in parallel when OLLAMA_NUM_PARALLEL > 1).
+        A sample that fails comes back as None so callers can skip it.
+        """
+        results = await asyncio.gather(
+            *[
+                self.generate(
+                    prompt=prompt,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    top_p=top_p
+                )
+                for _ in range(n)
+            ],
+            return_exceptions=True
+        )
+        return [None if isinstance(r, BaseException) else r for r in results]
+    
     async def generate_json(
         self,
         prompt: str,
@@ -192,7 +242,14 @@ class LLMService:
     def _get_fallback_response(self, prompt: str) -> str:
         """
         Generate a fallback response when LLM is unavailable
+        
+        The text is wrapped in FallbackResponse so caches can tell it apart
+        from a real completion.
         """
+        return FallbackResponse(self._fallback_text(prompt))
+    
+    def _fallback_text(self, prompt: str) -> str:
+        """Rule-based fallback steps for the prompt's subject"""
         # Simple rule-based fallback for demo
         if "database" in prompt.lower():
             return """
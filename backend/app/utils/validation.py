@@ -23,65 +23,117 @@ class ResponseValidator:
         """
         Validate response and return list of issues
         """
+        return [issue["issue"] for issue in self.validate_response_with_fixes(response)]
+    
+    def validate_response_with_fixes(self, response: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Validate response and return issues together with a programmatic fix
+        
+        Each entry has "issue", "target_field" and "suggested_fix". suggested_fix
+        is None when resolving the issue needs new content rather than a
+        structural repair. All recommendation-level fixes share one repaired
+        copy of the recommendations list.
+        """
         issues = []
         
         # Check if response has required fields
         if "recommendations" not in response:
-            issues.append("Missing recommendations field")
+            issues.append(self._issue("Missing recommendations field", "recommendations"))
             return issues
         
         recommendations = response.get("recommendations", [])
         
         if not recommendations:
-            issues.append("No recommendations provided")
+            issues.append(self._issue("No recommendations provided", "recommendations"))
             return issues
         
-        # Validate each recommendation
+        # Validate each recommendation, repairing a copy where possible
+        repaired = list(recommendations)
+        rec_issues = []
         for i, rec in enumerate(recommendations):
-            rec_issues = self._validate_recommendation(rec, i)
-            issues.extend(rec_issues)
+            rec_issues.extend(self._validate_recommendation(rec, i, repaired))
+        
+        for issue in rec_issues:
+            if issue["suggested_fix"] is not None:
+                issue["suggested_fix"] = repaired
+        issues.extend(rec_issues)
         
         # Check confidence scores
         if "confidence" in response:
             conf = response["confidence"]
             if conf < self.min_confidence:
-                issues.append(f"Confidence too low: {conf}")
+                issues.append(self._issue(f"Confidence too low: {conf}", "confidence"))
             elif conf > self.max_confidence:
-                issues.append(f"Invalid confidence: {conf}")
+                issues.append(self._issue(f"Invalid confidence: {conf}", "confidence", self.max_confidence))
         
         return issues
     
-    def _validate_recommendation(self, rec: Dict[str, Any], index: int) -> List[str]:
+    def _issue(self, issue: str, target_field: str, suggested_fix: Any = None) -> Dict[str, Any]:
         """
-        Validate individual recommendation
+        Build a structured validation issue
+        """
+        return {
+            "issue": issue,
+            "target_field": target_field,
+            "suggested_fix": suggested_fix
+        }
+    
+    def _validate_recommendation(
+        self,
+        rec: Dict[str, Any],
+        index: int,
+        repaired: List[Any]
+    ) -> List[Dict[str, Any]]:
+        """
+        Validate individual recommendation, writing structural repairs into
+        repaired[index]
         """
         issues = []
         prefix = f"Recommendation {index + 1}"
+        fixed = None
+        
+        def fixed_rec() -> Dict[str, Any]:
+            nonlocal fixed
+            if fixed is None:
+                fixed = repaired[index] = dict(rec)
+            return fixed
         
         # Check solution steps
         if "solution_steps" not in rec:
-            issues.append(f"{prefix}: Missing solution steps")
+            issues.append(self._issue(f"{prefix}: Missing solution steps", "recommendations"))
         else:
             steps = rec["solution_steps"]
             if not isinstance(steps, list):
-                issues.append(f"{prefix}: Solution steps should be a list")
+                fix = None
+                if isinstance(steps, str) and steps.strip():
+                    fixed_rec()["solution_steps"] = [steps]
+                    fix = True
+                issues.append(self._issue(f"{prefix}: Solution steps should be a list", "recommendations", fix))
             elif len(steps) < self.min_solution_steps:
-                issues.append(f"{prefix}: Too few solution steps ({len(steps)})")
+                issues.append(self._issue(f"{prefix}: Too few solution steps ({len(steps)})", "recommendations"))
             elif len(steps) > self.max_solution_steps:
-                issues.append(f"{prefix}: Too many solution steps ({len(steps)})")
+                issues.append(self._issue(f"{prefix}: Too many solution steps ({len(steps)})", "recommendations"))
             else:
-                # Check each step
+                # Check each step; empty ones can simply be dropped
                 for j, step in enumerate(steps):
                     if not step or len(str(step).strip()) < 10:
-                        issues.append(f"{prefix}: Step {j + 1} is too short or empty")
+                        fix = None
+                        if not str(step or "").strip():
+                            fix = True
+                        issues.append(self._issue(f"{prefix}: Step {j + 1} is too short or empty", "recommendations", fix))
+                if any(i["suggested_fix"] for i in issues):
+                    fixed_rec()["solution_steps"] = [
+                        step for step in steps if str(step or "").strip()
+                    ]
         
         # Check confidence
         if "confidence" in rec:
             conf = rec["confidence"]
             if not isinstance(conf, (int, float)):
-                issues.append(f"{prefix}: Invalid confidence type")
+                issues.append(self._issue(f"{prefix}: Invalid confidence type", "recommendations"))
             elif conf < 0 or conf > 1:
-                issues.append(f"{prefix}: Confidence out of range: {conf}")
+                fixed_rec()["confidence"] = min(max(conf, 0.0), 1.0)
+                issues.append(self._issue(f"{prefix}: Confidence out of range: {conf}", "recommendations", True))
         
         return issues
     
@@ -65,6 +65,9 @@ def mock_llm_service() -> LLMService:
             else:
                 return "Mock LLM response"
 
+        async def generate_n(self, prompt: str, n: int = 1, **kwargs):
+            return [await self.generate(prompt, **kwargs) for _ in range(n)]
+
     return MockLLM()
 
 
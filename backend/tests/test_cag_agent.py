@@ -0,0 +1,174 @@
+"""
+Tests for CAG Agent
+"""
+
+import asyncio
+import copy
+import json
+import threading
+
+import pytest
+from app.services.llm_service import FallbackResponse
+
+cag_agent = pytest.importorskip("app.agents.cag_agent")
+CAGAgent = cag_agent.CAGAgent
+CAGResponse = cag_agent.CAGResponse
+
+
+class RecordingLLM:
+    """LLM stub that records prompts and replies with a fixed text"""
+
+    def __init__(self, reply="Mock LLM response"):
+        self.reply = reply
+        self.prompts = []
+
+    async def generate(self, prompt: str, **kwargs):
+        self.prompts.append(prompt)
+        return self.reply
+
+
+@pytest.mark.unit
+@pytest.mark.cag
+class TestCAGAgent:
+    """Test CAG Agent"""
+
+    @pytest.mark.asyncio
+    async def test_deterministic_calls_are_cached(self):
+        """Test that identical low-temperature calls reach the LLM once"""
+        llm = RecordingLLM()
+        agent = CAGAgent(llm_service=llm)
+
+        first = await agent._cached_generate("Rate this", max_tokens=10, temperature=0.1)
+        second = await agent._cached_generate("Rate this", max_tokens=10, temperature=0.1)
+
+        assert first == second == "Mock LLM response"
+        assert len(llm.prompts) == 1
+
+    @pytest.mark.asyncio
+    async def test_fallback_responses_are_not_cached(self):
+        """Test that the fallback text from a failed call is not served again"""
+        llm = RecordingLLM(FallbackResponse("1. Check system logs for errors"))
+        agent = CAGAgent(llm_service=llm)
+
+        await agent._cached_generate("Rate this", max_tokens=10, temperature=0.1)
+        await agent._cached_generate("Rate this", max_tokens=10, temperature=0.1)
+
+        assert len(llm.prompts) == 2
+        assert not agent._deterministic_cache
+
+    def test_improvements_compare_only_corrected_fields(self):
+        """Test that only corrected or new fields are reported as improved"""
+        agent = CAGAgent(llm_service=RecordingLLM())
+        original = {"summary": "Restart", "notes": "old", "recommendations": [{"id": 1}]}
+        # As returned by the consistency pass: every value is a fresh object
+        refined = {
+            "summary": "Restart the service",
+            "notes": "reworded",
+            "recommendations": [{"id": 1}, {"id": 2}],
+            "root_cause": "Memory leak"
+        }
+        corrections = [{"target_field": "summary", "correction_type": "modification"}]
+
+        improvements = agent._identify_improvements(original, refined, corrections)
+
+        assert improvements == [
+            "Improved summary",
+            "Added root_cause",
+            "Added 1 recommendations"
+        ]
+
+    @pytest.mark.asyncio
+    async def test_validation_overlaps_review(self, sample_incident):
+        """Test that the validator runs while the review call is in flight"""
+        validated = threading.Event()
+        seen_during_review = []
+
+        class SlowLLM(RecordingLLM):
+            async def generate(self, prompt: str, **kwargs):
+                if not seen_during_review:
+                    seen_during_review.append(await asyncio.to_thread(validated.wait, 1.0))
+                return await super().generate(prompt, **kwargs)
+
+        agent = CAGAgent(llm_service=SlowLLM())
+        validate = agent.validator.validate_response_with_fixes
+
+        def recording_validate(response):
+            validated.set()
+            return validate(response)
+
+        agent.validator.validate_response_with_fixes = recording_validate
+
+        await agent._identify_issues(sample_incident, {"recommendations": [{"title": "Restart"}]})
+
+        assert seen_during_review == [True]
+
+    @pytest.mark.asyncio
+    async def test_validator_fixes_applied_without_mutating_input(self, sample_incident, sample_rag_response):
+        """Test that structural repairs reach the refined response and leave the input intact"""
+        # Empty replies: no critique or fact issues, so only the validator finds any
+        agent = CAGAgent(llm_service=RecordingLLM(""), config={"enable_consistency_check": False})
+        response = copy.deepcopy(sample_rag_response)
+        response["recommendations"][0]["solution_steps"] = "Restart the connection pool"
+        snapshot = copy.deepcopy(response)
+
+        iteration = await agent._refine_iteration(sample_incident, response, 0.65, 1)
+
+        assert "Recommendation 1: Solution steps should be a list" in iteration.issues_found
+        assert iteration.refined_response["recommendations"][0]["solution_steps"] == [
+            "Restart the connection pool"
+        ]
+        assert response == snapshot
+
+    @pytest.mark.asyncio
+    async def test_combined_review_is_one_call(self, sample_incident, sample_rag_response):
+        """Test that critique and fact check come back from a single review prompt"""
+        llm = RecordingLLM(json.dumps({"issues": ["No rollback plan"], "fact_errors": ["Wrong port"]}))
+        agent = CAGAgent(llm_service=llm)
+
+        issues, _ = await agent._identify_issues(sample_incident, sample_rag_response)
+
+        assert len(llm.prompts) == 1
+        assert issues[:2] == ["No rollback plan", "Factual error: Wrong port"]
+
+    @pytest.mark.asyncio
+    async def test_top_issues_ranked_by_source(self, sample_incident, sample_rag_response, monkeypatch):
+        """Test that the ten kept issues favour critique over fact check over validation"""
+        agent = CAGAgent(llm_service=RecordingLLM())
+        critique = [f"Critique {i}" for i in range(8)]
+        facts = [f"Factual error: fact {i}" for i in range(3)]
+
+        async def review(incident, response_json):
+            return critique, facts
+        monkeypatch.setattr(agent, "_combined_review", review)
+        monkeypatch.setattr(
+            agent.validator, "validate_response_with_fixes",
+            lambda response: [{"issue": "Validation", "target_field": "confidence", "suggested_fix": None}]
+        )
+
+        issues, _ = await agent._identify_issues(sample_incident, sample_rag_response)
+
+        assert issues == critique + facts[:2]
+
+    @pytest.mark.asyncio
+    async def test_correction_history_ring_buffer(self, sample_incident):
+        """Test that history keeps the newest refinements, oldest first"""
+        agent = CAGAgent(llm_service=RecordingLLM(), config={"max_history": 3})
+        for iterations in range(5):
+            await agent._update_learning(sample_incident, CAGResponse(
+                final_recommendations=[],
+                final_confidence=0.9 if iterations % 2 else 0.5,
+                iterations=[],
+                total_iterations=iterations,
+                improvement_percentage=10.0 * iterations,
+                sources=[],
+                metadata={}
+            ))
+
+        history = agent.correction_history
+        stats = await agent.get_correction_stats()
+
+        assert [entry["iterations"] for entry in history] == [2, 3, 4]
+        assert stats["total_corrections"] == 3
+        assert stats["average_iterations"] == pytest.approx(3.0)
+        assert stats["average_improvement"] == pytest.approx(30.0)
+        assert stats["success_rate"] == pytest.approx(1 / 3)
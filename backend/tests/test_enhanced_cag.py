@@ -2,14 +2,21 @@
 Tests for Enhanced CAG Agent with Specialized Critics
 """
 
+import asyncio
+import json
+import sys
+import threading
+from types import SimpleNamespace
+
 import pytest
+import numpy as np
 from app.agents.enhanced_cag_agent import (
     EnhancedCAGAgent,
-    TechnicalAccuracyCritic,
-    CompletenessCritic,
-    SafetyCritic,
-    ClarityCritic
+    Critic,
+    CriticEvaluation,
+    _CachedLLM
 )
+from app.services.llm_service import FallbackResponse
 
 
 @pytest.mark.unit
@@ -62,6 +69,74 @@ class TestEnhancedCAGAgent:
         assert response.total_stages > 0
         assert len(response.stages) > 0
 
+    @pytest.mark.asyncio
+    async def test_refinement_continues_while_confidence_moves(
+        self,
+        sample_incident,
+        sample_rag_response,
+        mock_llm_service
+    ):
+        """Test that a stage that still moves confidence is not mistaken for convergence"""
+        agent = EnhancedCAGAgent(
+            llm_service=mock_llm_service,
+            config={'max_stages': 3, 'enable_consistency_verification': False}
+        )
+
+        response = await agent.refine(
+            incident=sample_incident,
+            initial_response=sample_rag_response,
+            initial_confidence=0.2
+        )
+
+        assert response.total_stages > 1
+        assert response.stages[1].confidence_before == response.stages[0].confidence_after
+
+    @pytest.mark.asyncio
+    async def test_refinement_stops_after_losing_confidence_near_target(
+        self,
+        sample_incident,
+        sample_rag_response,
+        mock_llm_service,
+        monkeypatch
+    ):
+        """Test that a stage that lost confidence close to target ends refinement"""
+        agent = EnhancedCAGAgent(
+            llm_service=mock_llm_service,
+            config={'max_stages': 3, 'enable_consistency_verification': False}
+        )
+        monkeypatch.setattr(
+            agent, "_calculate_refined_confidence",
+            lambda confidence, health, penalty: confidence - 0.05
+        )
+
+        response = await agent.refine(
+            incident=sample_incident,
+            initial_response=sample_rag_response,
+            initial_confidence=0.75
+        )
+
+        assert response.total_stages == 1
+
+    @pytest.mark.asyncio
+    async def test_refine_batch(self, sample_incident, vague_incident, sample_rag_response, mock_llm_service):
+        """Test that a batch of incidents is refined in input order"""
+        agent = EnhancedCAGAgent(
+            llm_service=mock_llm_service,
+            config={'max_stages': 1, 'enable_consistency_verification': False}
+        )
+
+        responses = await agent.refine_batch(
+            [
+                (sample_incident, sample_rag_response, 0.4),
+                (vague_incident, sample_rag_response, 0.6)
+            ],
+            concurrency=1
+        )
+
+        assert len(responses) == 2
+        assert responses[0].metadata['initial_confidence'] == 0.4
+        assert responses[1].metadata['initial_confidence'] == 0.6
+
     @pytest.mark.asyncio
     async def test_critics_evaluation(self, sample_incident, sample_rag_response, mock_llm_service):
         """Test that all critics are evaluated"""
@@ -74,6 +149,27 @@ class TestEnhancedCAGAgent:
         critic_names = {e.critic_name for e in evaluations}
         assert len(critic_names) > 0
 
+    @pytest.mark.asyncio
+    async def test_batched_critics_single_call(self, sample_incident, sample_rag_response):
+        """Test that batched critics share one LLM call"""
+        class BatchLLM:
+            calls = 0
+
+            async def generate(self, prompt: str, **kwargs):
+                BatchLLM.calls += 1
+                return json.dumps([
+                    {"critic_name": name, "score": 90, "issues": [], "suggestions": [], "severity": "low"}
+                    for name in ["technical_accuracy", "completeness", "safety", "clarity"]
+                ])
+
+        agent = EnhancedCAGAgent(llm_service=BatchLLM(), config={'batch_critics': True})
+
+        evaluations = await agent._run_critics(sample_incident, sample_rag_response)
+
+        assert BatchLLM.calls == 1
+        assert {e.critic_name for e in evaluations} == set(agent.critics)
+        assert all(e.score == 0.9 for e in evaluations)
+
     @pytest.mark.asyncio
     async def test_consistency_verification(
         self,
@@ -96,6 +192,93 @@ class TestEnhancedCAGAgent:
         assert 0.0 <= consistency_score <= 1.0
         assert isinstance(alternatives, list)
 
+    @pytest.mark.asyncio
+    async def test_identical_critic_prompts_are_cached(self, sample_incident, sample_rag_response):
+        """Test that re-evaluating an unchanged response reuses the LLM reply"""
+        class CountingLLM:
+            calls = 0
+
+            async def generate(self, prompt: str, **kwargs):
+                CountingLLM.calls += 1
+                return "[]"
+
+        agent = EnhancedCAGAgent(llm_service=CountingLLM(), config={'batch_critics': False})
+
+        await agent._run_critics(sample_incident, sample_rag_response)
+        await agent._run_critics(sample_incident, sample_rag_response)
+
+        assert CountingLLM.calls == 4
+
+    @pytest.mark.asyncio
+    async def test_converged_critics_are_skipped(self, sample_incident, sample_rag_response):
+        """Test that critics that met the target last stage are not re-run"""
+        class BatchLLM:
+            prompts = []
+
+            async def generate(self, prompt: str, **kwargs):
+                BatchLLM.prompts.append(prompt)
+                return json.dumps([
+                    {"critic_name": name, "score": 60, "issues": [], "suggestions": [], "severity": "low"}
+                    for name in ["technical_accuracy", "completeness", "clarity"]
+                ])
+
+        agent = EnhancedCAGAgent(llm_service=BatchLLM())
+        converged = CriticEvaluation(
+            critic_name="safety", score=0.95, issues=[], suggestions=[],
+            severity="low", processing_time=1.0
+        )
+
+        evaluations = await agent._run_critics(
+            sample_incident, sample_rag_response, converged=[converged]
+        )
+
+        assert len(BatchLLM.prompts) == 1
+        assert "safety" not in BatchLLM.prompts[0].split("expert perspectives")[1]
+        reused = [e for e in evaluations if e.critic_name == "safety"]
+        assert len(reused) == 1 and reused[0].reused and reused[0].processing_time == 0.0
+        assert len(evaluations) == 4
+
+    @pytest.mark.asyncio
+    async def test_embedding_consistency_score(self, sample_rag_response, mock_llm_service):
+        """Test that consistency is scored by embedding similarity without an LLM call"""
+        class MockEmbedder:
+            model = object()
+
+            def generate(self, texts, normalize=True):
+                return np.ones((len(texts), 8)) / np.sqrt(8)
+
+        class NoCallLLM:
+            async def generate(self, prompt: str, **kwargs):
+                raise AssertionError("LLM should not be called")
+
+        agent = EnhancedCAGAgent(llm_service=NoCallLLM(), embedder=MockEmbedder())
+
+        score = await agent._compute_consistency_score(
+            sample_rag_response,
+            [{"alternative_id": 1, "solution": "Check the connection pool"}]
+        )
+
+        assert score == pytest.approx(1.0)
+
+    def test_merge_consistent_parts(self, sample_rag_response, mock_llm_service):
+        """Test that only new steps from alternatives are merged, in order"""
+        agent = EnhancedCAGAgent(llm_service=mock_llm_service)
+
+        merged = agent._merge_consistent_parts(
+            sample_rag_response,
+            [{"alternative_id": 1, "solution": "1. increase  timeout values\n2. Restart the API server\n3) Review slow queries"}]
+        )
+
+        assert merged['recommendations'][0]['solution_steps'] == [
+            "Check database connection pool configuration",
+            "Increase timeout values",
+            "Monitor connection pool usage",
+            "Restart the API server",
+            "Review slow queries"
+        ]
+        assert merged['recommendations'][0]['root_cause'] == "Database connection pool exhaustion"
+        assert len(sample_rag_response['recommendations'][0]['solution_steps']) == 3
+
     @pytest.mark.asyncio
     async def test_cag_statistics(self, mock_llm_service):
         """Test CAG statistics collection"""
@@ -107,16 +290,50 @@ class TestEnhancedCAGAgent:
         assert 'average_stages' in stats
         assert 'critic_statistics' in stats
 
+    @pytest.mark.asyncio
+    async def test_embedder_loads_once_off_event_loop(self, mock_llm_service, monkeypatch):
+        """Test that the embedding model is constructed once, in a worker thread"""
+        loader_threads = []
+
+        class FakeEmbedder:
+            model = object()
+
+            def __init__(self):
+                loader_threads.append(threading.get_ident())
+
+        monkeypatch.setitem(
+            sys.modules, "app.utils.embeddings", SimpleNamespace(EmbeddingGenerator=FakeEmbedder)
+        )
+        agent = EnhancedCAGAgent(llm_service=mock_llm_service)
+
+        first, second = await asyncio.gather(agent._get_embedder(), agent._get_embedder())
+
+        assert first is second
+        assert len(loader_threads) == 1
+        assert loader_threads[0] != threading.get_ident()
+
 
 @pytest.mark.unit
 @pytest.mark.cag
 class TestCritics:
     """Test individual critics"""
 
+    @pytest.fixture
+    def critics(self, mock_llm_service):
+        """Critics as configured by the agent"""
+        return EnhancedCAGAgent(llm_service=mock_llm_service).critics
+
+    def test_critic_definitions(self, critics):
+        """Test that each critic carries its own rubric and fallback evaluation"""
+        assert all(isinstance(c, Critic) for c in critics.values())
+        assert len({c.rubric for c in critics.values()}) == 4
+        assert critics['technical_accuracy'].weight == 1.5
+        assert critics['safety'].default_severity == "low"
+
     @pytest.mark.asyncio
-    async def test_technical_accuracy_critic(self, sample_incident, sample_rag_response, mock_llm_service):
+    async def test_technical_accuracy_critic(self, sample_incident, sample_rag_response, critics):
         """Test technical accuracy critic"""
-        critic = TechnicalAccuracyCritic(mock_llm_service)
+        critic = critics['technical_accuracy']
 
         evaluation = await critic.evaluate(sample_incident, sample_rag_response)
 
@@ -126,9 +343,9 @@ class TestCritics:
         assert isinstance(evaluation.suggestions, list)
 
     @pytest.mark.asyncio
-    async def test_completeness_critic(self, sample_incident, sample_rag_response, mock_llm_service):
+    async def test_completeness_critic(self, sample_incident, sample_rag_response, critics):
         """Test completeness critic"""
-        critic = CompletenessCritic(mock_llm_service)
+        critic = critics['completeness']
 
         evaluation = await critic.evaluate(sample_incident, sample_rag_response)
 
@@ -136,9 +353,9 @@ class TestCritics:
         assert 0.0 <= evaluation.score <= 1.0
 
     @pytest.mark.asyncio
-    async def test_safety_critic(self, sample_incident, sample_rag_response, mock_llm_service):
+    async def test_safety_critic(self, sample_incident, sample_rag_response, critics):
         """Test safety critic"""
-        critic = SafetyCritic(mock_llm_service)
+        critic = critics['safety']
 
         evaluation = await critic.evaluate(sample_incident, sample_rag_response)
 
@@ -146,11 +363,53 @@ class TestCritics:
         assert evaluation.severity in ["low", "medium", "high", "critical"]
 
     @pytest.mark.asyncio
-    async def test_clarity_critic(self, sample_incident, sample_rag_response, mock_llm_service):
+    async def test_clarity_critic(self, sample_incident, sample_rag_response, critics):
         """Test clarity critic"""
-        critic = ClarityCritic(mock_llm_service)
+        critic = critics['clarity']
 
         evaluation = await critic.evaluate(sample_incident, sample_rag_response)
 
         assert evaluation.critic_name == "clarity"
         assert 0.0 <= evaluation.score <= 1.0
+
+
+class CountingLLM:
+    """LLM stub that counts calls and replies with a fixed text"""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = 0
+
+    async def generate(self, prompt: str, **kwargs):
+        self.calls += 1
+        return self.reply
+
+
+@pytest.mark.unit
+@pytest.mark.cag
+class TestCachedLLM:
+    """Test the completion cache in front of the critics' LLM"""
+
+    @pytest.mark.asyncio
+    async def test_repeated_prompt_served_from_cache(self):
+        """Test that an identical low-temperature call reaches the LLM once"""
+        llm = CountingLLM("Score: 0.9")
+        cached = _CachedLLM(llm)
+
+        await cached.generate("Evaluate", temperature=0.1)
+        result = await cached.generate("Evaluate", temperature=0.1)
+
+        assert result == "Score: 0.9"
+        assert llm.calls == 1
+
+    @pytest.mark.asyncio
+    async def test_fallback_responses_are_not_cached(self):
+        """Test that fallback text from a failed call is not stored"""
+        llm = CountingLLM(FallbackResponse("1. Check system logs for errors"))
+        cached = _CachedLLM(llm)
+
+        await cached.generate("Evaluate", temperature=0.1)
+        await cached.generate("Evaluate", temperature=0.1)
+
+        assert llm.calls == 2
+        assert not cached._entries
@@ -0,0 +1,130 @@
+"""
+Tests for LLM response caching
+"""
+
+import asyncio
+import zlib
+import pytest
+import numpy as np
+from app.services.llm_cache import SemanticLLMCache
+from app.services.llm_service import FallbackResponse
+
+
+class MockEmbedder:
+    """Bag-of-words embedder so similar prompts get similar vectors"""
+
+    model = object()
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate(self, texts, normalize=True):
+        self.calls += 1
+        if isinstance(texts, str):
+            texts = [texts]
+        vectors = np.zeros((len(texts), 256))
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, zlib.crc32(word.encode()) % 256] += 1.0
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class CountingLLM:
+    """LLM stub that records how many calls reached it"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def generate(self, prompt: str, **kwargs):
+        self.calls += 1
+        return f"response {self.calls}"
+
+
+class FailingLLM(CountingLLM):
+    """LLM stub that answers with the fallback text, as LLMService does on errors"""
+
+    async def generate(self, prompt: str, **kwargs):
+        self.calls += 1
+        return FallbackResponse("1. Check system logs for errors")
+
+
+@pytest.mark.unit
+class TestSemanticLLMCache:
+    """Test semantic LLM cache"""
+
+    @pytest.mark.asyncio
+    async def test_similar_prompt_hits_cache(self):
+        """Test that a near-duplicate prompt is answered from the cache"""
+        llm = CountingLLM()
+        cache = SemanticLLMCache(llm, embedder=MockEmbedder(), threshold=0.8)
+
+        first = await cache.generate("Rate this response\nDatabase connection pool exhausted after deploy")
+        second = await cache.generate("Rate this response\nDatabase connection pool exhausted after a deploy")
+
+        assert first == second
+        assert llm.calls == 1
+        assert cache.get_stats()['hits'] == 1
+
+    @pytest.mark.asyncio
+    async def test_templates_do_not_cross_match(self):
+        """Test that prompts from different call sites never share entries"""
+        llm = CountingLLM()
+        cache = SemanticLLMCache(llm, embedder=MockEmbedder(), threshold=0.5)
+
+        await cache.generate("Rate this response\nDatabase connection pool exhausted")
+        await cache.generate("Check the facts\nDatabase connection pool exhausted")
+
+        assert llm.calls == 2
+
+    @pytest.mark.asyncio
+    async def test_lru_eviction(self):
+        """Test that the cache is bounded by max_size"""
+        llm = CountingLLM()
+        cache = SemanticLLMCache(llm, embedder=MockEmbedder(), threshold=0.99, max_size=2)
+
+        for prompt in ["Rate\nalpha", "Rate\nbravo", "Rate\ncharlie"]:
+            await cache.generate(prompt)
+        await cache.generate("Rate\nalpha")
+
+        assert cache.get_stats()['entries'] == 2
+        assert llm.calls == 4
+
+    @pytest.mark.asyncio
+    async def test_concurrent_prompts_share_one_encode(self):
+        """Test that prompts arriving together are embedded in one batch"""
+        embedder = MockEmbedder()
+        cache = SemanticLLMCache(CountingLLM(), embedder=embedder)
+        warmup_calls = embedder.calls
+
+        await asyncio.gather(*[
+            cache.generate(f"Rate\nincident {i}") for i in range(5)
+        ])
+
+        assert embedder.calls - warmup_calls == 1
+
+    @pytest.mark.asyncio
+    async def test_disabled_without_model(self):
+        """Test pass-through when the embedding model is unavailable"""
+        embedder = MockEmbedder()
+        embedder.model = None
+        llm = CountingLLM()
+        cache = SemanticLLMCache(llm, embedder=embedder)
+
+        await cache.generate("Rate\nalpha")
+        await cache.generate("Rate\nalpha")
+
+        assert not cache.enabled
+        assert llm.calls == 2
+
+    @pytest.mark.asyncio
+    async def test_fallback_responses_are_not_cached(self):
+        """Test that an outage's fallback text is not served once the LLM recovers"""
+        llm = FailingLLM()
+        cache = SemanticLLMCache(llm, embedder=MockEmbedder(), threshold=0.8)
+
+        first = await cache.generate("Rate this response\nDatabase connection pool exhausted")
+        second = await cache.generate("Rate this response\nDatabase connection pool exhausted")
+
+        assert isinstance(first, FallbackResponse) and isinstance(second, FallbackResponse)
+        assert llm.calls == 2
+        assert cache.get_stats()['entries'] == 0
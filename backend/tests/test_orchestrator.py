@@ -0,0 +1,118 @@
+"""
+Tests for Agent Orchestrator
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+orchestrator = pytest.importorskip("app.agents.orchestrator")
+from app.agents.cag_agent import CAGIteration, CAGResponse
+
+AgentOrchestrator = orchestrator.AgentOrchestrator
+
+
+def make_cag_response(confidences, metadata=None):
+    """Build a CAG response with one iteration per confidence value"""
+    iterations = [
+        CAGIteration(
+            iteration_number=i + 1,
+            input_response={},
+            corrections=[],
+            refined_response={},
+            confidence_before=0.5,
+            confidence_after=confidence,
+            issues_found=[],
+            improvements=[]
+        )
+        for i, confidence in enumerate(confidences)
+    ]
+    return CAGResponse(
+        final_recommendations=[],
+        final_confidence=confidences[-1] if confidences else 0.5,
+        iterations=iterations,
+        total_iterations=len(iterations),
+        improvement_percentage=0.0,
+        sources=[],
+        metadata=metadata or {}
+    )
+
+
+@pytest.mark.unit
+class TestAgentOrchestrator:
+    """Test Agent Orchestrator"""
+
+    def test_refinement_time_uses_measured_time(self):
+        """Test that the time reported by the CAG agent is used as-is"""
+        cag_response = make_cag_response([0.6, 0.8], metadata={"processing_time": 1.25})
+
+        assert AgentOrchestrator._refinement_time(cag_response) == 1.25
+
+    @pytest.mark.parametrize("confidences", [[], [0.6], [0.6, 0.75, 0.9]])
+    def test_refinement_time_estimate_without_measurement(self, confidences):
+        """Test that 0.5s per iteration is estimated when no time was measured"""
+        cag_response = make_cag_response(confidences)
+
+        estimate = AgentOrchestrator._refinement_time(cag_response)
+
+        assert estimate == cag_response.total_iterations * 0.5
+
+    def test_batch_metrics_match_sequential_updates(self):
+        """Test that the closed-form batch EMA matches a per-incident EMA"""
+        confidences = [0.4, 0.9, 0.65, 0.7, 0.2]
+        expected = 0.5
+        for confidence in confidences:
+            expected = 0.1 * confidence + 0.9 * expected
+
+        batched = AgentOrchestrator(None, None, None)
+        batched.average_confidence = 0.5
+        batched._update_metrics_batch(np.array(confidences))
+
+        assert batched.average_confidence == pytest.approx(expected)
+
+    def test_recorded_confidences_fold_in_on_flush(self):
+        """Test that per-incident confidences reach the average once flushed"""
+        orchestrator = AgentOrchestrator(None, None, None)
+        for confidence in [0.4, 0.9]:
+            orchestrator._update_metrics({"confidence": confidence})
+
+        assert orchestrator.average_confidence == 0.0
+
+        orchestrator._flush_metrics()
+
+        assert orchestrator.average_confidence == pytest.approx(0.1 * 0.9 + 0.9 * (0.1 * 0.4))
+
+    def test_training_data_is_columnar(self):
+        """Test that positively rated history is returned as parallel arrays"""
+        orchestrator = AgentOrchestrator(None, None, None)
+        orchestrator.processing_history.extend([
+            {"incident_id": "INC-1", "rating": 5},
+            {"incident_id": "INC-2", "rating": 1},
+            {"incident_id": "INC-3", "rating": 4, "confidence": 0.6},
+        ])
+
+        data = orchestrator._prepare_training_data()
+
+        assert list(data["incident_id"]) == ["INC-1", "INC-3"]
+        assert data["success"].all()
+        assert data["confidence"].dtype == np.float32
+        assert data["confidence"].tolist() == pytest.approx([0.8, 0.6])
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("parallel", [True, False])
+    async def test_prediction_failure_propagates(self, sample_incident, parallel):
+        """Test that a crashed prediction fails the stage instead of being dropped"""
+        async def failing_predict(incident):
+            raise RuntimeError("predictor down")
+
+        orchestrator = AgentOrchestrator(
+            None, None, SimpleNamespace(predict=failing_predict),
+            config={"enable_cag": False, "parallel_processing": parallel}
+        )
+        rag_response = SimpleNamespace(confidence=0.9)
+
+        with pytest.raises(RuntimeError, match="predictor down"):
+            await orchestrator._run_refinement_and_prediction(
+                sample_incident, rag_response, None
+            )
@@ -0,0 +1,269 @@
+"""
+Tests for Predictive Agent
+"""
+
+import asyncio
+import numpy as np
+import pytest
+from app.agents import predictor
+from app.agents.predictor import PredictiveAgent, _float32_floor
+
+
+@pytest.fixture(scope="module")
+def predictive_agent() -> PredictiveAgent:
+    """Train the synthetic-data models once for the whole module"""
+    return PredictiveAgent()
+
+
+def assert_same_predictions(actual, expected):
+    """Compare predictions field by field, ignoring timestamped metadata"""
+    assert len(actual) == len(expected)
+    for got, want in zip(actual, expected):
+        for key, value in want.items():
+            if key == "metadata":
+                continue
+            if isinstance(value, float):
+                # Batched model calls may differ from single rows in the last ulp
+                assert got[key] == pytest.approx(value)
+            else:
+                assert got[key] == value
+
+
+@pytest.mark.unit
+@pytest.mark.predictor
+class TestPredictiveAgent:
+    """Test Predictive Agent"""
+
+    @pytest.mark.asyncio
+    async def test_predict_returns_bounded_fields(self, predictive_agent, sample_incident):
+        """Test that a single prediction has every field within range"""
+        prediction = await predictive_agent.predict(sample_incident)
+
+        assert prediction["severity"] in ["low", "medium", "high", "critical"]
+        assert 5 <= prediction["resolution_time"] <= 480
+        assert 0.0 <= prediction["severity_confidence"] <= 1.0
+        assert prediction["team"] in predictive_agent.team_encoder.classes_
+        assert type(prediction["team"]) is str
+        assert "fallback_mode" not in prediction["metadata"]
+
+    @pytest.mark.asyncio
+    async def test_batch_matches_single_predictions(self, predictive_agent, sample_incident, vague_incident):
+        """Test that batched and concurrent predictions match one-at-a-time predictions"""
+        incidents = [sample_incident, vague_incident, sample_incident]
+        single = [await predictive_agent.predict(incident) for incident in incidents]
+
+        batched = await predictive_agent.predict_batch(incidents)
+        concurrent = await asyncio.gather(*(predictive_agent.predict(i) for i in incidents))
+
+        assert_same_predictions(batched, single)
+        assert_same_predictions(concurrent, single)
+
+    @pytest.mark.asyncio
+    async def test_concurrent_predictions_share_one_batch(self, predictive_agent, sample_incident, monkeypatch):
+        """Test that predictions arriving together run through the models once"""
+        batch_sizes = []
+        predict_many = predictive_agent._predict_many
+
+        def recording_predict_many(incidents):
+            batch_sizes.append(len(incidents))
+            return predict_many(incidents)
+
+        monkeypatch.setattr(predictive_agent, "_predict_many", recording_predict_many)
+        # Cache hits would skip the queue; this test is about the misses
+        predictive_agent._prediction_cache.clear()
+        await asyncio.gather(*(predictive_agent.predict(sample_incident) for _ in range(5)))
+
+        assert batch_sizes == [5]
+
+    @pytest.mark.asyncio
+    async def test_fast_mode_skips_models(self, predictive_agent, sample_incident, monkeypatch):
+        """Test that fast predictions return category defaults without running the models"""
+        def fail(incidents):
+            raise AssertionError("models should not run in fast mode")
+        monkeypatch.setattr(predictive_agent, "_predict_many", fail)
+
+        prediction = await predictive_agent.predict(sample_incident, fast=True)
+        batch = await predictive_agent.predict_batch([sample_incident], fast=True)
+
+        assert prediction["metadata"]["fallback_mode"] is True
+        assert_same_predictions(batch, [prediction])
+
+    @pytest.mark.asyncio
+    async def test_repeated_incidents_use_prediction_cache(self, sample_incident, vague_incident, monkeypatch):
+        """Test that identical model inputs are predicted once and served as copies"""
+        agent = PredictiveAgent()
+        predicted = []
+        uncached = agent._predict_uncached
+
+        def counting(incidents):
+            predicted.extend(incidents)
+            return uncached(incidents)
+        monkeypatch.setattr(agent, "_predict_uncached", counting)
+
+        first = await agent.predict_batch([sample_incident, vague_incident])
+        first[0]["risk_factors"].append("mutated by caller")
+        repeat = sample_incident.model_copy(update={"id": "test-003"})
+        second = await agent.predict_batch([repeat, vague_incident])
+
+        assert predicted == [sample_incident, vague_incident]
+        assert "mutated by caller" not in second[0]["risk_factors"]
+        assert_same_predictions(second[1:], first[1:])
+
+    @pytest.mark.asyncio
+    async def test_cached_prediction_skips_batch_queue(self, sample_incident, monkeypatch):
+        """Test that a cache hit returns without waiting for a batch"""
+        agent = PredictiveAgent({"batch_window": 60.0})
+        first = await agent.predict_batch([sample_incident])
+
+        def fail(incident):
+            raise AssertionError("cache hit should not be queued")
+        monkeypatch.setattr(agent, "_enqueue", fail)
+        prediction = await agent.predict(sample_incident)
+
+        assert_same_predictions([prediction], first)
+
+    @pytest.mark.asyncio
+    async def test_failed_training_is_retried(self, sample_incident, monkeypatch):
+        """Test that a failed training falls back uncached and retries on the next prediction"""
+        monkeypatch.setattr(predictor, "_MODEL_CACHE", {})
+        agent = PredictiveAgent()
+        train = PredictiveAgent._train_with_synthetic_data
+        monkeypatch.setattr(PredictiveAgent, "_train_with_synthetic_data", lambda self: False)
+
+        fallback = await agent.predict(sample_incident)
+
+        assert fallback["metadata"]["fallback_mode"] is True
+        assert not agent._models_ready
+        assert not agent._prediction_cache
+
+        monkeypatch.setattr(PredictiveAgent, "_train_with_synthetic_data", train)
+        prediction = await agent.predict(sample_incident)
+
+        assert "fallback_mode" not in prediction["metadata"]
+        assert agent._models_ready
+
+    def test_agents_share_trained_models(self, predictive_agent):
+        """Test that a second agent with the same settings reuses the trained models"""
+        other = PredictiveAgent()
+        assert not hasattr(other.severity_model, "classes_"), "models should train on first use"
+
+        predictive_agent._ensure_models()
+        other._ensure_models()
+
+        assert other.severity_model is predictive_agent.severity_model
+        assert other.team_model is predictive_agent.team_model
+
+    def test_batch_features(self, predictive_agent, sample_incident, vague_incident):
+        """Test batch feature values, defaults, and zeroed rows for malformed incidents"""
+        no_timestamp = vague_incident.model_copy(update={"timestamp": None})
+        malformed = vague_incident.model_copy(update={"title": None})
+        incidents = [sample_incident, no_timestamp, malformed]
+
+        batch = predictive_agent._extract_features_batch(incidents)
+
+        assert batch.shape == (3, predictive_agent.n_features)
+        assert batch.dtype == np.float32 and batch.flags.c_contiguous
+        np.testing.assert_array_equal(batch[0], predictive_agent._extract_features(sample_incident)[0])
+        assert batch[1, 2] == len(no_timestamp.title)
+        assert batch[1, 3] == 3  # "Application is slow"
+        assert batch[1, 6] == 0 and batch[1, 7] == 0
+        assert list(batch[1, 10:]) == [12, 2, 0, 1]
+        assert not batch[2].any()
+
+    @pytest.mark.asyncio
+    async def test_random_forest_backend_uses_joint_classifier(self, sample_incident, vague_incident, monkeypatch):
+        """Test that severity and team come from one multi-output forest"""
+        agent = PredictiveAgent({"model_backend": "random_forest", "joint_classifier": True})
+        assert agent.severity_model is agent.team_model
+
+        predictions = await agent.predict_batch([sample_incident, vague_incident])
+        for prediction in predictions:
+            assert prediction["severity"] in ["low", "medium", "high", "critical"]
+            assert prediction["team"] in agent.team_encoder.classes_
+            assert "fallback_mode" not in prediction["metadata"]
+
+        features = agent._extract_features_batch([sample_incident, vague_incident])
+        compiled = agent._predict_joint_proba(features)
+        monkeypatch.setattr(agent, "_onnx_sessions", {})
+        reference = agent._predict_joint_proba(features)
+        for got, want in zip(compiled, reference):
+            np.testing.assert_allclose(got, want, rtol=1e-5, atol=1e-6)
+
+    @pytest.mark.parametrize("joint", [True, False])
+    def test_compiled_forests_match_sklearn(self, joint, monkeypatch):
+        """Test that the flattened-array forest traversal matches sklearn's predictions"""
+        agent = PredictiveAgent({"model_backend": "random_forest", "use_onnx": False, "joint_classifier": joint})
+        agent._ensure_models()
+        assert set(agent._forests) == set(agent._model_heads())
+
+        features = agent._synthetic_features(64, np.random.default_rng(0))
+
+        def predict_all():
+            severity_proba, team_proba = agent._predict_joint_proba(features)
+            return (
+                agent._predict_severity(features, severity_proba),
+                agent._predict_team(features, team_proba),
+                agent._predict_resolution_time(features),
+            )
+
+        compiled = predict_all()
+        monkeypatch.setattr(agent, "_forests", {})
+        reference = predict_all()
+
+        for (got_labels, got_confs), (want_labels, want_confs) in zip(compiled, reference):
+            assert got_labels == want_labels
+            assert got_confs == pytest.approx(want_confs)
+
+    def test_float32_thresholds_keep_split_decisions(self):
+        """Test that rounded thresholds send every float32 value the same way"""
+        thresholds = np.array([0.1, 2.5, 1 / 3, 1e-8, -0.7, 1e6 + 0.3])
+        rounded = _float32_floor(thresholds)
+        assert rounded.dtype == np.float32
+
+        for threshold, low in zip(thresholds, rounded):
+            high = np.nextafter(low, np.float32(np.inf))
+            assert low <= threshold < high
+
+    def test_blocked_traversal_matches_whole_forest(self, monkeypatch):
+        """Test that walking the forest in tree blocks gives the same averages"""
+        agent = PredictiveAgent({"model_backend": "random_forest", "use_onnx": False})
+        agent._ensure_models()
+        features = agent._synthetic_features(32, np.random.default_rng(0))
+        whole = predictor._traverse_forest(agent._forests["joint"], features)
+
+        monkeypatch.setattr(predictor, "_TREE_BLOCK_BYTES", 1)
+        monkeypatch.setattr(predictor, "_TREE_BLOCK_MIN_RECORDS", 1)
+        forest = predictor._compile_forest(agent.severity_model)
+        assert len(forest["blocks"]) == len(agent.severity_model.estimators_)
+
+        np.testing.assert_allclose(predictor._traverse_forest(forest, features), whole, rtol=1e-5)
+
+    def test_threaded_traversal_matches_serial(self, monkeypatch):
+        """Test that splitting a batch across threads gives the serial result"""
+        agent = PredictiveAgent({"model_backend": "random_forest", "use_onnx": False})
+        agent._ensure_models()
+        forest = agent._forests["joint"]
+        features = agent._synthetic_features(50, np.random.default_rng(0))
+        serial = predictor._traverse_forest(forest, features)
+
+        monkeypatch.setattr(predictor, "_TRAVERSAL_THREADS", 4)
+        monkeypatch.setattr(predictor, "_PARALLEL_MIN_WORK", 1)
+
+        np.testing.assert_array_equal(predictor._traverse_forest(forest, features), serial)
+
+    def test_models_reload_from_cache_dir(self, tmp_path, monkeypatch):
+        """Test that a fresh process reloads saved models and ONNX graphs without rebuilding"""
+        config = {"model_backend": "random_forest", "model_cache_dir": str(tmp_path)}
+        monkeypatch.setattr(predictor, "_MODEL_CACHE", {})
+        first = PredictiveAgent(config)
+        first._ensure_models()
+
+        monkeypatch.setattr(predictor, "_MODEL_CACHE", {})
+        monkeypatch.setattr(PredictiveAgent, "_train_with_synthetic_data", lambda self: pytest.fail("retrained"))
+        monkeypatch.setattr(predictor, "convert_sklearn", lambda *a, **k: pytest.fail("reconverted"), raising=False)
+        second = PredictiveAgent(config)
+        second._ensure_models()
+
+        assert set(second._onnx_sessions) == set(first._onnx_sessions)
+        features = second._synthetic_features(16, np.random.default_rng(0))
+        assert second._predict_team(features) == first._predict_team(features)